@@ -179,4 +179,15 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
-AUTH_USER_MODEL = 'accounts.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.User'
+
+# Serialized barcode scan results. Set 'ALIAS' to a shared cache (e.g. Redis)
+# when running several workers so invalidations reach all of them.
+PRODUCT_SCAN_CACHE = {
+    'ALIAS': None,
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': 300,
+}
+
+# Worker processes for batch barcode label rendering (None = one per CPU)
+BARCODE_RENDER_WORKERS = None
\ No newline at end of file
@@ -1,6 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
 import nested_admin
 from .models import Category, Location, Product, ProductLocation, Purchase, PurchaseItem, PurchaseItemLocation
+from . import purchases, stock
+from django.db import transaction
 
 class ProductLocationInline(admin.TabularInline):
     model = ProductLocation
@@ -45,10 +48,33 @@ class PurchaseAdmin(nested_admin.NestedModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # The whole save runs in the admin's transaction; letting the shortage
+        # propagate out of it rolls back the header and inline rows as well.
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except stock.InsufficientStock as e:
+            for product_id, location_id, available, delta in e.shortages:
+                self.message_user(
+                    request,
+                    f"Not saved: stock of product {product_id} at location {location_id} would drop "
+                    f"below zero (have {available}, change {delta}).",
+                    messages.ERROR,
+                )
+            return HttpResponseRedirect(request.get_full_path())
+
     def save_related(self, request, form, formsets, change):
-        super().save_related(request, form, formsets, change)
-        form.instance.total_amount = form.instance.calculate_total_amount()
-        form.instance.save(update_fields=["total_amount"])
+        # Inline rows are saved one by one without touching stock; the net
+        # change of the whole form is then applied as one locked batch.
+        purchase = form.instance
+        with transaction.atomic():
+            before = purchases.purchase_stock(purchase) if change else {}
+            super().save_related(request, form, formsets, change)
+            after = purchases.purchase_stock(purchase)
+            purchases.apply_purchase_stock(purchase, purchases.stock_difference(before, after))
+
+            purchase.total_amount = purchase.calculate_total_amount()
+            purchase.save(update_fields=["total_amount"])
 
 @admin.register(PurchaseItem)
 class PurchaseItemAdmin(admin.ModelAdmin):
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Purchase, PurchaseItemLocation, SupplierSpend
+
+SPEND_FIELDS = ('spend', 'discount', 'units', 'invoices')
+GROUP_FIELDS = ('supplier_name', 'purchased_by', 'month')
+
+# ----------------------------
+# Months
+# ----------------------------
+
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def months_between(first, last):
+    """First days of every month from `first` to `last`, inclusive."""
+    month, last = month_start(first), month_start(last)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+# ----------------------------
+# Aggregating purchases
+# ----------------------------
+
+def _new_cell():
+    # [spend, discount, units, invoices]
+    return [Decimal('0'), Decimal('0'), 0, 0]
+
+def aggregate_purchases(purchases):
+    """
+    {(supplier_name, purchased_by, month): [spend, discount, units, invoices]}
+    for a Purchase queryset, with two grouped queries. Spend is the
+    purchases' total_amount, i.e. after discount.
+    """
+    cells = defaultdict(_new_cell)
+    for row in purchases.annotate(month=TruncMonth('purchase_date')).values(
+        'supplier_name', 'purchased_by', 'month'
+    ).annotate(
+        spend=Coalesce(Sum('total_amount'), Decimal('0')),
+        discount=Coalesce(Sum('discount'), Decimal('0')),
+        invoices=Count('id'),
+    ).order_by():
+        cell = cells[row['supplier_name'], row['purchased_by'] or '', row['month']]
+        cell[0] += row['spend']
+        cell[1] += row['discount']
+        cell[3] += row['invoices']
+
+    prefix = 'purchase_item__purchase__'
+    for row in PurchaseItemLocation.objects.filter(purchase_item__purchase__in=purchases).annotate(
+        month=TruncMonth(prefix + 'purchase_date')
+    ).values(prefix + 'supplier_name', prefix + 'purchased_by', 'month').annotate(
+        units=Sum('quantity')
+    ).order_by():
+        cells[row[prefix + 'supplier_name'], row[prefix + 'purchased_by'] or '', row['month']][2] += row['units']
+    return cells
+
+def _month_purchases(month, suppliers=None):
+    purchases = Purchase.objects.filter(purchase_date__gte=month, purchase_date__lt=next_month(month))
+    if suppliers is not None:
+        purchases = purchases.filter(supplier_name__in=suppliers)
+    return purchases
+
+def compute_month(month, suppliers=None):
+    """Rollup cells of one month, optionally only for some suppliers. Read-only."""
+    return aggregate_purchases(_month_purchases(month, suppliers))
+
+@transaction.atomic
+def store_month(month, cells, suppliers=None):
+    """Replace the month's rollup rows (or just those of `suppliers`) with `cells`."""
+    existing = SupplierSpend.objects.filter(month=month)
+    if suppliers is not None:
+        existing = existing.filter(supplier_name__in=suppliers)
+    existing.delete()
+    SupplierSpend.objects.bulk_create([
+        SupplierSpend(
+            supplier_name=supplier_name, purchased_by=purchased_by, month=cell_month,
+            spend=spend, discount=discount, units=units, invoices=invoices,
+        )
+        for (supplier_name, purchased_by, cell_month), (spend, discount, units, invoices) in cells.items()
+    ])
+    return len(cells)
+
+# ----------------------------
+# Incremental updates
+# ----------------------------
+
+def purchase_key(supplier_name, purchase_date):
+    return supplier_name, month_start(purchase_date)
+
+def refresh(keys):
+    """
+    Recompute the rollups of the given (supplier_name, month) pairs from
+    their purchases. Called whenever a purchase is saved or deleted; each
+    pair costs one month of one supplier, not a rescan.
+    """
+    suppliers_by_month = defaultdict(set)
+    for supplier_name, month in keys:
+        if supplier_name is not None and month is not None:
+            suppliers_by_month[month].add(supplier_name)
+    for month, suppliers in suppliers_by_month.items():
+        store_month(month, compute_month(month, suppliers), suppliers)
+
+# ----------------------------
+# Full rebuild
+# ----------------------------
+
+def purchase_months():
+    """Every month that has purchases, oldest first."""
+    first = Purchase.objects.aggregate(first=Min('purchase_date'))['first']
+    if first is None:
+        return []
+    last = Purchase.objects.order_by('-purchase_date').values_list('purchase_date', flat=True).first()
+    return list(months_between(first, last))
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def _rollup_cells(first_month, last_month, filters):
+    cells = {}
+    for row in SupplierSpend.objects.filter(month__gte=first_month, month__lte=last_month, **filters).values(
+        *GROUP_FIELDS, *SPEND_FIELDS
+    ):
+        cells[tuple(row[field] for field in GROUP_FIELDS)] = [row[field] for field in SPEND_FIELDS]
+    return cells
+
+def _live_cells(first_day, last_day, filters):
+    purchases = Purchase.objects.filter(purchase_date__gte=first_day, purchase_date__lte=last_day)
+    if 'purchased_by' in filters:
+        if filters['purchased_by']:
+            purchases = purchases.filter(purchased_by=filters['purchased_by'])
+        else:
+            purchases = purchases.filter(Q(purchased_by='') | Q(purchased_by__isnull=True))
+    if 'supplier_name' in filters:
+        purchases = purchases.filter(supplier_name=filters['supplier_name'])
+    return aggregate_purchases(purchases)
+
+def get_spend(date_from=None, date_to=None, supplier_name=None, purchased_by=None, group_by=('supplier_name',)):
+    """
+    Spend, discount, units and invoice count between two dates (inclusive),
+    grouped by any of supplier_name, purchased_by and month. Whole months
+    come from the rollups; only the partial first and last months are
+    aggregated from purchases.
+    """
+    date_to = date_to or date.today()
+    if date_from is None:
+        first = SupplierSpend.objects.aggregate(first=Min('month'))['first']
+        date_from = first or month_start(date_to)
+
+    filters = {}
+    if supplier_name is not None:
+        filters['supplier_name'] = supplier_name
+    if purchased_by is not None:
+        filters['purchased_by'] = purchased_by
+
+    first_full = date_from if date_from.day == 1 else next_month(month_start(date_from))
+    # Months whose last day is within the range are complete
+    last_full = month_start(date_to) if next_month(month_start(date_to)) - timedelta(days=1) == date_to \
+        else month_start(month_start(date_to) - timedelta(days=1))
+
+    parts = []
+    if first_full <= last_full:
+        parts.append(_rollup_cells(first_full, last_full, filters))
+        if date_from < first_full:
+            parts.append(_live_cells(date_from, first_full - timedelta(days=1), filters))
+        if next_month(last_full) <= date_to:
+            parts.append(_live_cells(next_month(last_full), date_to, filters))
+    elif date_from <= date_to:
+        parts.append(_live_cells(date_from, date_to, filters))
+
+    groups = defaultdict(_new_cell)
+    for cells in parts:
+        for key, values in cells.items():
+            group = groups[tuple(value for field, value in zip(GROUP_FIELDS, key) if field in group_by)]
+            for i, value in enumerate(values):
+                group[i] += value
+
+    rows = []
+    totals = dict(zip(SPEND_FIELDS, _new_cell()))
+    for key, values in groups.items():
+        row = dict(zip([field for field in GROUP_FIELDS if field in group_by], key))
+        row.update(zip(SPEND_FIELDS, values))
+        rows.append(row)
+        for field, value in zip(SPEND_FIELDS, values):
+            totals[field] += value
+    if 'month' in group_by:
+        rows.sort(key=lambda row: (row['month'], -row['spend']))
+    else:
+        rows.sort(key=lambda row: -row['spend'])
+
+    return {'date_from': date_from, 'date_to': date_to, 'group_by': list(group_by), 'totals': totals, 'rows': rows}
@@ -0,0 +1,48 @@
+import hashlib
+import io
+
+import barcode
+from barcode.writer import ImageWriter, SVGWriter
+from django.conf import settings
+
+from .cache import LRUCache
+
+# Bump when the writer options or python-barcode output change so clients
+# holding the old immutable images fetch new ones.
+RENDER_VERSION = 1
+
+WRITER_OPTIONS = {'module_width': 0.3, 'module_height': 15, 'font_size': 10}
+
+FORMATS = {
+    'png': ('image/png', ImageWriter),
+    'svg': ('image/svg+xml', SVGWriter),
+}
+
+def barcode_etag(code, fmt='png'):
+    """Strong ETag derived from everything the rendered image depends on."""
+    options = ','.join(f'{k}={v}' for k, v in sorted(WRITER_OPTIONS.items()))
+    key = f'{RENDER_VERSION}|code128|{fmt}|{options}|{code}'
+    return '"{}"'.format(hashlib.sha256(key.encode()).hexdigest())
+
+def render_barcode(code, fmt='png', options=None):
+    """Render a Code128 barcode to bytes. Top level so worker processes can call it."""
+    writer_class = FORMATS[fmt][1]
+    barcode_img = barcode.get_barcode_class('code128')(code, writer=writer_class())
+
+    buffer = io.BytesIO()
+    barcode_img.write(buffer, options=options or WRITER_OPTIONS)
+    return buffer.getvalue()
+
+image_cache = LRUCache(
+    max_entries=getattr(settings, 'BARCODE_IMAGE_CACHE_ENTRIES', 1024),
+    timeout=getattr(settings, 'BARCODE_IMAGE_CACHE_TIMEOUT', 24 * 60 * 60),
+)
+
+def get_barcode(code, fmt='png'):
+    """Return (etag, content_type, bytes), rendering only on a cache miss."""
+    etag = barcode_etag(code, fmt)
+    content = image_cache.get(etag)
+    if content is None:
+        content = render_barcode(code, fmt)
+        image_cache.set(etag, content)
+    return etag, FORMATS[fmt][0], content
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# ----------------------------
+# Scan payload cache
+# ----------------------------
+
+class LRUCache:
+    """
+    Small thread-safe LRU with a TTL, used per process when no shared cache
+    backend is configured.
+    """
+
+    def __init__(self, max_entries=2048, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class ScanCache:
+    """
+    Serialized `scan_barcode` payloads keyed by product unique_id.
+
+    Configured with settings.PRODUCT_SCAN_CACHE:
+        'ALIAS': name of a Django cache to share entries between workers
+                 (default: None, an in-process LRU)
+        'MAX_ENTRIES': LRU size (default 2048)
+        'TIMEOUT': seconds an entry lives (default 300)
+    """
+    prefix = 'product-scan:'
+
+    def __init__(self):
+        config = getattr(settings, 'PRODUCT_SCAN_CACHE', {})
+        self.alias = config.get('ALIAS')
+        self.timeout = config.get('TIMEOUT', 300)
+        self.local = LRUCache(config.get('MAX_ENTRIES', 2048), self.timeout)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias] if self.alias else None
+
+    def _key(self, unique_id):
+        return f'{self.prefix}{unique_id}'
+
+    def get(self, unique_id):
+        backend = self.backend
+        if backend is not None:
+            value = backend.get(self._key(unique_id))
+        else:
+            value = self.local.get(unique_id)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, unique_id, payload):
+        backend = self.backend
+        if backend is not None:
+            backend.set(self._key(unique_id), payload, self.timeout)
+        else:
+            self.local.set(unique_id, payload)
+
+    def invalidate(self, unique_ids):
+        unique_ids = [u for u in unique_ids if u]
+        if not unique_ids:
+            return
+        backend = self.backend
+        if backend is not None:
+            backend.delete_many([self._key(u) for u in unique_ids])
+        else:
+            self.local.delete_many(unique_ids)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.alias or 'local',
+            'entries': None if self.alias else len(self.local),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+scan_cache = ScanCache()
+
+def invalidate_products(product_ids=None, **filters):
+    """
+    Drop cached scan payloads for the given product ids, or for the products
+    matching `filters` (e.g. category=..., product_locations__location=...).
+    """
+    from .models import Product
+
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        filters['pk__in'] = product_ids
+    scan_cache.invalidate(list(Product.objects.filter(**filters).values_list('unique_id', flat=True)))
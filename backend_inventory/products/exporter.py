@@ -0,0 +1,137 @@
+import csv
+import json
+import tempfile
+from itertools import islice
+
+from sales.models import SalesSection, SectionProductPrice
+
+from .importer import STOCK_COLUMN_PREFIX
+from .models import Location, Product, ProductLocation
+
+PRICE_COLUMN_PREFIX = 'price:'
+
+PRODUCT_FIELDS = [
+    'id', 'unique_id', 'item_name', 'brand', 'serial_number', 'variants',
+    'category__name', 'rate', 'active', 'description', 'created_at',
+]
+
+# Column names match the importer, so an export can load products into an empty
+# catalog. The importer only creates products: rows whose unique_id already
+# exists are reported as errors, not updated.
+PRODUCT_COLUMNS = [
+    'id', 'unique_id', 'item_name', 'brand', 'serial_number', 'variants',
+    'category', 'rate', 'active', 'description', 'created_at',
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+class ExportFormatError(Exception):
+    """The requested export format cannot be produced."""
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+def _section_label(section):
+    return f'{section.channel.name}/{section.name}'
+
+def iter_products(chunk_size=2000):
+    """
+    Yield (product_values, {location_id: qty}, {section_id: price}) for the
+    whole catalog. Products are read with a server-side iterator; stock and
+    prices are fetched once per chunk, so memory stays flat.
+    """
+    products = Product.objects.order_by('id').values(*PRODUCT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(products, chunk_size))
+        if not chunk:
+            return
+
+        ids = [p['id'] for p in chunk]
+        stock = {}
+        for product_id, location_id, quantity in ProductLocation.objects.filter(
+            product_id__in=ids
+        ).values_list('product_id', 'location_id', 'quantity'):
+            stock.setdefault(product_id, {})[location_id] = quantity
+
+        prices = {}
+        for product_id, section_id, price in SectionProductPrice.objects.filter(
+            product_id__in=ids
+        ).values_list('product_id', 'section_id', 'price'):
+            prices.setdefault(product_id, {})[section_id] = price
+
+        for product in chunk:
+            yield product, stock.get(product['id'], {}), prices.get(product['id'], {})
+
+def _flat_rows(locations, sections, chunk_size):
+    yield (
+        PRODUCT_COLUMNS
+        + [f'{STOCK_COLUMN_PREFIX}{location.name}' for location in locations]
+        + [f'{PRICE_COLUMN_PREFIX}{_section_label(section)}' for section in sections]
+    )
+    for product, stock, prices in iter_products(chunk_size):
+        row = [product[field] for field in PRODUCT_FIELDS]
+        row += [stock.get(location.id, '') for location in locations]
+        row += [prices.get(section.id, '') for section in sections]
+        yield row
+
+def stream_csv(locations, sections, chunk_size):
+    writer = csv.writer(_Echo())
+    for row in _flat_rows(locations, sections, chunk_size):
+        yield writer.writerow(row)
+
+def stream_ndjson(locations, sections, chunk_size):
+    location_names = {location.id: location.name for location in locations}
+    section_names = {section.id: _section_label(section) for section in sections}
+    for product, stock, prices in iter_products(chunk_size):
+        record = dict(zip(PRODUCT_COLUMNS, (product[field] for field in PRODUCT_FIELDS)))
+        record['rate'] = str(record['rate'])
+        record['created_at'] = record['created_at'].isoformat()
+        record['stock'] = {location_names[k]: v for k, v in stock.items()}
+        record['prices'] = {section_names[k]: str(v) for k, v in prices.items()}
+        yield json.dumps(record) + '\n'
+
+def stream_xlsx(locations, sections, chunk_size, block_size=64 * 1024):
+    """
+    XLSX is a zip archive that can only be read once complete, so it is
+    built in a write-only workbook spooled to disk and then streamed out.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Products')
+    for row in _flat_rows(locations, sections, chunk_size):
+        sheet.append([
+            value.replace(tzinfo=None) if hasattr(value, 'tzinfo') else value
+            for value in row
+        ])
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            block = spool.read(block_size)
+            if not block:
+                break
+            yield block
+
+def export_products(fmt, chunk_size=2000):
+    """Return a generator producing the catalog export in `fmt`."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportFormatError(f"Unsupported format '{fmt}'. Use csv, ndjson or xlsx.")
+    if fmt == 'xlsx':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ExportFormatError('XLSX export needs openpyxl; install it or use csv/ndjson.')
+
+    locations = list(Location.objects.order_by('name'))
+    sections = list(SalesSection.objects.select_related('channel').order_by('channel__name', 'name'))
+    streams = {'csv': stream_csv, 'ndjson': stream_ndjson, 'xlsx': stream_xlsx}
+    return streams[fmt](locations, sections, chunk_size)
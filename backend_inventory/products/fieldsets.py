@@ -0,0 +1,71 @@
+from rest_framework import serializers
+
+# ----------------------------
+# ?fields= / ?expand=
+# ----------------------------
+
+def parse_field_list(value):
+    """'id, item_name,rate' -> {'id', 'item_name', 'rate'}; missing or empty -> None."""
+    if not value:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    return names or None
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin driven by the `fields` and `expand` context keys (see
+    SparseFieldsetViewMixin).
+
+    `fields` keeps only the listed fields. `expand` swaps a field for the
+    nested serializer declared in Meta.expandable_fields, or adds it when it
+    is not part of the default output:
+
+        expandable_fields = {'section': (SalesSectionSerializer, {})}
+
+    Only the top-level serializer of a response is narrowed.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_response_root():
+            return fields
+
+        expand = self.context.get('expand') or set()
+        for name, (serializer_class, kwargs) in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name in expand:
+                fields[name] = serializer_class(read_only=True, **kwargs)
+
+        requested = self.context.get('fields')
+        if requested:
+            keep = requested | expand
+            fields = {name: field for name, field in fields.items() if name in keep}
+        return fields
+
+    def _is_response_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+class SparseFieldsetViewMixin:
+    """
+    ViewSet mixin that reads ?fields= and ?expand= on GET requests and hands
+    them to the serializer. get_queryset() implementations use wants() and
+    expands() to skip joins, prefetches and annotations nobody asked for.
+    """
+
+    def _field_params(self):
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return None, set()
+        params = self.request.query_params
+        return parse_field_list(params.get('fields')), parse_field_list(params.get('expand')) or set()
+
+    def wants(self, name):
+        fields, expand = self._field_params()
+        return fields is None or name in fields or name in expand
+
+    def expands(self, name):
+        return name in self._field_params()[1]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self._field_params()
+        return context
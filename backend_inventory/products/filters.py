@@ -0,0 +1,12 @@
+import django_filters
+
+from .models import Purchase
+
+class PurchaseFilter(django_filters.FilterSet):
+    """Exact matches plus an inclusive ?date_from=&date_to= purchase date range."""
+    date_from = django_filters.DateFilter(field_name='purchase_date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='purchase_date', lookup_expr='lte')
+
+    class Meta:
+        model = Purchase
+        fields = ['supplier_name', 'payment_mode', 'purchase_date', 'purchased_by']
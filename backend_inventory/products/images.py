@@ -0,0 +1,178 @@
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# Longest edge in pixels for each generated variant. The uploaded file is
+# kept untouched as the original.
+VARIANTS = {
+    'thumbnail': 200,
+    'medium': 800,
+}
+
+VARIANT_DIR = 'product_images/variants'
+
+QUALITY = 80
+
+# Invoice scans are stored once per distinct upload, bounded to this edge
+INVOICE_DIR = 'invoices'
+INVOICE_MAX_EDGE = 2000
+# JPEG/WebP uploads already within bounds are kept byte for byte
+INVOICE_PASSTHROUGH_FORMATS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+INVOICE_PASSTHROUGH_BYTES = 1536 * 1024
+
+def variant_format():
+    """WebP when Pillow was built with it, JPEG otherwise."""
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+def variant_name(image_name, variant):
+    """Deterministic storage name, e.g. product_images/variants/<stem>_thumbnail.webp."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANT_DIR}/{stem}_{variant}.{variant_format()[1]}'
+
+def render_variants(content):
+    """
+    Return {variant: bytes} for an uploaded image. Pure Pillow and top level
+    so the backfill command can run it in worker processes.
+    """
+    pil_format, _ = variant_format()
+    largest = max(VARIANTS.values())
+    with Image.open(io.BytesIO(content)) as source:
+        # JPEGs decode straight at a reduced scale, still >= the largest variant
+        source.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        if pil_format == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # Largest first, each variant resized from the previous one
+        rendered = {}
+        for variant, edge in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, quality=QUALITY, optimize=True)
+            rendered[variant] = buffer.getvalue()
+        return rendered
+
+def _field(product, variant):
+    return getattr(product, f'image_{variant}')
+
+def store_variants(product, rendered):
+    """Write rendered variants next to each other and point the product at them."""
+    # Imported here so render worker processes never load the ORM
+    from .models import Product
+    from .sync import record_changes
+
+    names = {}
+    for variant, content in rendered.items():
+        field = _field(product, variant)
+        name = variant_name(product.image.name, variant)
+        # Same source, same name: replace rather than letting storage pick a new one
+        if field.storage.exists(name):
+            field.storage.delete(name)
+        names[f'image_{variant}'] = field.storage.save(name, ContentFile(content))
+
+    Product.objects.filter(pk=product.pk).update(**names)
+    record_changes([product.pk])
+    for attr, name in names.items():
+        getattr(product, attr).name = name
+
+def delete_variant_files(storage, names):
+    for name in names:
+        if name:
+            storage.delete(name)
+
+def delete_variants(product):
+    """Remove variant files and clear the fields, e.g. when the image is removed."""
+    from .models import Product
+    from .sync import record_changes
+
+    names = {}
+    for variant in VARIANTS:
+        field = _field(product, variant)
+        delete_variant_files(field.storage, [field.name])
+        names[f'image_{variant}'] = None
+        field.name = None
+    if product.pk:
+        Product.objects.filter(pk=product.pk).update(**names)
+        record_changes([product.pk])
+
+def generate_variants(product):
+    """
+    Render and store the variants of `product.image`. Returns False when the
+    file is missing or cannot be decoded; the product then keeps serving the
+    original.
+    """
+    if not product.image:
+        delete_variants(product)
+        return False
+    try:
+        product.image.open('rb')
+        try:
+            content = product.image.read()
+        finally:
+            product.image.close()
+        rendered = render_variants(content)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return False
+    store_variants(product, rendered)
+    return True
+
+def file_digest(upload):
+    """SHA-256 of an uploaded file, read in chunks."""
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+def _recompress_invoice(source):
+    pil_format, _ = variant_format()
+    # JPEGs decode straight at a reduced scale instead of full resolution
+    source.draft('RGB', (INVOICE_MAX_EDGE, INVOICE_MAX_EDGE))
+    image = ImageOps.exif_transpose(source)
+    image = image.convert('RGBA' if pil_format == 'WEBP' and 'A' in image.getbands() else 'RGB')
+    image.thumbnail((INVOICE_MAX_EDGE, INVOICE_MAX_EDGE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+def store_invoice_image(upload, storage=None):
+    """
+    Store an uploaded invoice under a name derived from its content,
+    invoices/<aa>/<sha256>.<ext>, and return that name. A scan that was
+    uploaded before is not decoded or written again. Small JPEG/WebP files
+    within INVOICE_MAX_EDGE are kept as uploaded; anything else is decoded at
+    reduced scale and recompressed.
+    """
+    storage = storage or default_storage
+    digest = file_digest(upload)
+    try:
+        # Opening only reads the header; pixels are decoded on demand
+        with Image.open(upload) as source:
+            ext = INVOICE_PASSTHROUGH_FORMATS.get(source.format)
+            passthrough = ext and max(source.size) <= INVOICE_MAX_EDGE and upload.size <= INVOICE_PASSTHROUGH_BYTES
+            if not passthrough:
+                ext = variant_format()[1]
+            name = f'{INVOICE_DIR}/{digest[:2]}/{digest}.{ext}'
+            if storage.exists(name):
+                return name
+            if passthrough:
+                upload.seek(0)
+                content = upload.read()
+            else:
+                content = _recompress_invoice(source)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        # Keep what was uploaded rather than losing the invoice
+        name = f'{INVOICE_DIR}/{digest[:2]}/{digest}{os.path.splitext(upload.name)[1].lower()}'
+        if storage.exists(name):
+            return name
+        upload.seek(0)
+        content = upload.read()
+    return storage.save(name, ContentFile(content))
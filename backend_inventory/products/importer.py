@@ -0,0 +1,304 @@
+import codecs
+import csv
+import io
+import os
+import uuid
+import zipfile
+import zlib
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from xml.etree import ElementTree
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from . import stock, summary, sync
+from .models import Category, Location, Product, ProductLocation, StockMovement, barcode_validator
+
+# Stock columns are named "qty:<location name>", e.g. "qty:Main Store"
+STOCK_COLUMN_PREFIX = 'qty:'
+
+# Matches Product.rate and the PositiveIntegerField range of ProductLocation.quantity
+RATE_FIELD = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+MAX_QUANTITY = 2147483647
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+class ImportFormatError(Exception):
+    """
+    The uploaded file cannot be read as a product sheet. `report` holds the
+    rows already imported when this happens part-way through the file.
+    """
+    report = None
+
+# ----------------------------
+# Readers
+# ----------------------------
+
+def _normalize_header(header):
+    return [str(h or '').strip() for h in header]
+
+def _check_utf8(fileobj, chunk_size=1 << 16):
+    """
+    Decode the whole upload once before importing, so a file in another
+    encoding is refused up front instead of after some chunks are written.
+    """
+    if not fileobj.seekable():
+        return
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    offset = 0
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            decoder.decode(chunk, final=not chunk)
+            if not chunk:
+                break
+            offset += len(chunk)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(
+            f'The file is not UTF-8 text (bad byte at offset {offset + e.start}). Save it as "CSV UTF-8" and retry.'
+        )
+    finally:
+        fileobj.seek(0)
+
+def iter_csv_rows(fileobj):
+    _check_utf8(fileobj)
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        header = _normalize_header(next(reader, []))
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield dict(zip(header, values))
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFormatError(f'Could not read the CSV past line {reader.line_num}: {e}')
+
+def iter_xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFormatError('XLSX import needs openpyxl; install it or upload a CSV.')
+
+    # Corrupt workbooks fail in zipfile, zlib or the XML parser, on open or mid-sheet
+    unreadable = (zipfile.BadZipFile, InvalidFileException, KeyError, EOFError, zlib.error, ElementTree.ParseError)
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except unreadable as e:
+        raise ImportFormatError(f'The file is not a readable XLSX workbook: {e}')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _normalize_header(next(rows, ()))
+        for values in rows:
+            if any(v not in (None, '') for v in values):
+                yield {h: ('' if v is None else str(v)) for h, v in zip(header, values)}
+    except unreadable as e:
+        raise ImportFormatError(f'The workbook is damaged and could not be read to the end: {e}')
+    finally:
+        workbook.close()
+
+def iter_rows(fileobj, filename):
+    """Yield one dict per data row of a CSV or XLSX upload, read lazily."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.csv':
+        return iter_csv_rows(fileobj)
+    if ext in ('.xlsx', '.xlsm'):
+        return iter_xlsx_rows(fileobj)
+    raise ImportFormatError(f"Unsupported file type '{ext or filename}'. Upload .csv or .xlsx.")
+
+# ----------------------------
+# Import
+# ----------------------------
+
+class ProductImporter:
+    """
+    Validate and insert products chunk by chunk: one IN query checks a whole
+    chunk's barcodes, and products and stock rows go in with bulk_create.
+    """
+
+    def __init__(self, chunk_size=1000, create_categories=False, dry_run=False):
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.dry_run = dry_run
+        self.categories = {c.name.lower(): c.id for c in Category.objects.all()}
+        self.locations = {l.name.lower(): l.id for l in Location.objects.all()}
+        self.seen_ids = set()
+        self.report = {'rows': 0, 'created': 0, 'errors': []}
+
+    def run(self, rows):
+        """
+        Import every row and return the report. A file that turns out to be
+        unreadable part-way raises ImportFormatError with `report` set to
+        what was already committed; ImportFormatError.report is None when
+        nothing was read.
+        """
+        rows = enumerate(rows, start=2)  # row 1 is the header
+        while True:
+            try:
+                chunk = list(islice(rows, self.chunk_size))
+            except ImportFormatError as e:
+                if self.report['rows']:
+                    self.report['errors'].sort(key=lambda error: error['row'])
+                    # Earlier chunks are committed: rows 2..last_row, minus the rejected ones
+                    e.report = {**self.report, 'last_row': self.report['rows'] + 1}
+                raise
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        self.report['errors'].sort(key=lambda error: error['row'])
+        return self.report
+
+    def _import_chunk(self, chunk):
+        self.report['rows'] += len(chunk)
+
+        parsed = []
+        for line, row in chunk:
+            product, stock, errors = self._parse(row)
+            if errors:
+                self.report['errors'].append({'row': line, 'errors': errors})
+            else:
+                parsed.append((line, product, stock))
+
+        # Barcodes already in the database, for the whole chunk at once
+        given = [p.unique_id for _, p, _ in parsed if p.unique_id]
+        taken = set(Product.objects.filter(unique_id__in=given).values_list('unique_id', flat=True))
+
+        valid = []
+        for line, product, stock in parsed:
+            if not product.unique_id:
+                product.unique_id = uuid.uuid4().hex[:12].upper()
+            elif product.unique_id in taken:
+                self.report['errors'].append({'row': line, 'errors': {'unique_id': 'A product with this barcode already exists.'}})
+                continue
+            elif product.unique_id in self.seen_ids:
+                self.report['errors'].append({'row': line, 'errors': {'unique_id': 'Duplicate barcode earlier in the file.'}})
+                continue
+            self.seen_ids.add(product.unique_id)
+            valid.append((line, product, stock))
+
+        if valid and not self.dry_run:
+            try:
+                self._write(valid)
+            except IntegrityError:
+                # A barcode was taken after the check above; drop those rows and retry once
+                valid = self._drop_taken(valid)
+                try:
+                    self._write(valid)
+                except IntegrityError as e:
+                    for line, _, _ in valid:
+                        self.report['errors'].append({'row': line, 'errors': {'non_field_errors': f'Could not be saved: {e}'}})
+                    valid = []
+        self.report['created'] += len(valid)
+
+    def _drop_taken(self, valid):
+        taken = set(Product.objects.filter(
+            unique_id__in=[product.unique_id for _, product, _ in valid]
+        ).values_list('unique_id', flat=True))
+        kept = []
+        for line, product, stock in valid:
+            if product.unique_id in taken:
+                self.report['errors'].append({'row': line, 'errors': {'unique_id': 'A product with this barcode already exists.'}})
+            else:
+                product.pk = None
+                kept.append((line, product, stock))
+        return kept
+
+    @transaction.atomic
+    def _write(self, valid):
+        products = Product.objects.bulk_create([product for _, product, _ in valid])
+
+        stock_rows = [
+            ProductLocation(product=product, location_id=location_id, quantity=quantity)
+            for product, (_, _, stock) in zip(products, valid)
+            for location_id, quantity in stock.items()
+        ]
+        ProductLocation.objects.bulk_create(stock_rows)
+
+        # bulk_create skips model signals; keep the totals, ledger and sync journal in step
+        summary.add_products(products)
+        sync.record_changes(product.pk for product in products)
+        with stock.movement_source(StockMovement.IMPORT):
+            stock.stock_changed([(pl.product_id, pl.location_id, 0, pl.quantity) for pl in stock_rows])
+
+    def _parse(self, row):
+        errors = {}
+        get = lambda key: (row.get(key) or '').strip()
+
+        item_name = get('item_name')
+        if not item_name:
+            errors['item_name'] = 'This field is required.'
+
+        rate = None
+        try:
+            # Rejects inf/nan and values that do not fit the column
+            rate = RATE_FIELD.run_validation(get('rate'))
+        except serializers.ValidationError as e:
+            errors['rate'] = str(e.detail[0])
+
+        unique_id = get('unique_id').upper()
+        if unique_id:
+            try:
+                barcode_validator(unique_id)
+            except DjangoValidationError as e:
+                errors['unique_id'] = e.messages[0]
+
+        category_id = None
+        category_name = get('category')
+        if not category_name:
+            errors['category'] = 'This field is required.'
+        else:
+            category_id = self.categories.get(category_name.lower())
+            if category_id is None:
+                if self.create_categories and not self.dry_run:
+                    category_id = Category.objects.create(name=category_name).id
+                    self.categories[category_name.lower()] = category_id
+                elif not self.create_categories:
+                    errors['category'] = f"Unknown category '{category_name}'."
+
+        active = True
+        if get('active'):
+            value = get('active').lower()
+            if value not in TRUE_VALUES | FALSE_VALUES:
+                errors['active'] = 'Use true/false.'
+            active = value in TRUE_VALUES
+
+        stock = {}
+        for key, value in row.items():
+            if not key.lower().startswith(STOCK_COLUMN_PREFIX) or not (value or '').strip():
+                continue
+            location_name = key[len(STOCK_COLUMN_PREFIX):].strip()
+            location_id = self.locations.get(location_name.lower())
+            if location_id is None:
+                errors[key] = f"Unknown location '{location_name}'."
+                continue
+            try:
+                quantity = Decimal(value.strip())
+                if not quantity.is_finite() or quantity != quantity.to_integral_value() or not 0 <= quantity <= MAX_QUANTITY:
+                    raise InvalidOperation
+            except (InvalidOperation, ValueError, OverflowError):
+                errors[key] = 'A non-negative whole number is required.'
+                continue
+            stock[location_id] = int(quantity)
+
+        for field, limit in (('item_name', 200), ('brand', 100), ('serial_number', 100), ('variants', 200)):
+            if len(get(field)) > limit:
+                errors[field] = f'Ensure this field has no more than {limit} characters.'
+
+        product = Product(
+            unique_id=unique_id,
+            item_name=item_name,
+            brand=get('brand'),
+            serial_number=get('serial_number'),
+            variants=get('variants'),
+            category_id=category_id,
+            rate=rate,
+            active=active,
+            description=get('description'),
+        )
+        return product, stock, errors
+
+def import_products(fileobj, filename, **options):
+    """Import a CSV/XLSX product sheet and return the row report."""
+    return ProductImporter(**options).run(iter_rows(fileobj, filename))
@@ -0,0 +1,121 @@
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+from .barcodes import barcode_etag, image_cache, render_barcode
+
+# A4 portrait, in millimetres
+PAGE_SIZE_MM = (210, 297)
+PAGE_MARGIN_MM = 8
+CELL_PADDING_MM = 2
+
+# Below this many barcodes to render, process start-up and IPC cost more
+# than rendering inline.
+PARALLEL_THRESHOLD = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_render_pool():
+    """Long-lived pool shared by all requests; spawned so no server threads are forked."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'BARCODE_RENDER_WORKERS', None),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+def render_many(codes):
+    """Return {code: png_bytes}, using the image cache and the process pool for misses."""
+    rendered = {}
+    missing = []
+    for code in codes:
+        content = image_cache.get(barcode_etag(code, 'png'))
+        if content is None:
+            missing.append(code)
+        else:
+            rendered[code] = content
+
+    if len(missing) >= PARALLEL_THRESHOLD:
+        results = get_render_pool().map(render_barcode, missing, chunksize=max(1, len(missing) // 32))
+    else:
+        results = map(render_barcode, missing)
+
+    for code, content in zip(missing, results):
+        image_cache.set(barcode_etag(code, 'png'), content)
+        rendered[code] = content
+    return rendered
+
+def _mm_to_px(mm, dpi):
+    return int(round(mm / 25.4 * dpi))
+
+def _fit(image, width, height):
+    scale = min(width / image.width, height / image.height)
+    return image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+
+def render_label_sheet(labels, names, columns=3, rows=8, dpi=200):
+    """
+    Lay out `labels` ([(unique_id, copies), ...]) on A4 pages in a
+    columns x rows grid and return the list of page images. `names` maps
+    unique_id to the caption printed above the barcode.
+    """
+    images = {
+        code: Image.open(io.BytesIO(content)).convert('L')
+        for code, content in render_many({code for code, _ in labels}).items()
+    }
+
+    page_w, page_h = (_mm_to_px(mm, dpi) for mm in PAGE_SIZE_MM)
+    margin = _mm_to_px(PAGE_MARGIN_MM, dpi)
+    padding = _mm_to_px(CELL_PADDING_MM, dpi)
+    cell_w = (page_w - 2 * margin) // columns
+    cell_h = (page_h - 2 * margin) // rows
+
+    font = ImageFont.load_default(size=max(8, cell_h // 8))
+    caption_h = font.size + padding
+
+    # Scale each distinct barcode once, not per copy
+    fitted = {
+        code: _fit(image, cell_w - 2 * padding, cell_h - 2 * padding - caption_h)
+        for code, image in images.items()
+    }
+
+    per_page = columns * rows
+    pages = []
+    slot = 0
+    for code, copies in labels:
+        for _ in range(copies):
+            if slot % per_page == 0:
+                pages.append(Image.new('L', (page_w, page_h), 255))
+            page = pages[-1]
+            col, row = slot % columns, (slot % per_page) // columns
+            left, top = margin + col * cell_w, margin + row * cell_h
+
+            draw = ImageDraw.Draw(page)
+            caption = names.get(code, '')[:40]
+            draw.text((left + cell_w // 2, top + padding), caption, fill=0, font=font, anchor='mt')
+
+            image = fitted[code]
+            page.paste(image, (left + (cell_w - image.width) // 2, top + padding + caption_h))
+            slot += 1
+
+    return pages
+
+def encode_pages(pages, fmt, dpi, page=1):
+    """PDF gets every page; PNG gets the single requested page."""
+    if fmt != 'pdf':
+        pages = [pages[page - 1]]
+    # Labels are black on white; bilevel pages are several times smaller
+    pages = [p.convert('1', dither=Image.Dither.NONE) for p in pages]
+
+    buffer = io.BytesIO()
+    if fmt == 'pdf':
+        pages[0].save(buffer, 'PDF', save_all=True, append_images=pages[1:], resolution=dpi)
+    else:
+        pages[0].save(buffer, 'PNG', dpi=(dpi, dpi))
+    return buffer.getvalue()
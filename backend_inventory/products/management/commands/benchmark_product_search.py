@@ -0,0 +1,92 @@
+# products/management/commands/benchmark_product_search.py
+import random
+import time
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+from products.models import Product
+from products.search import search_products
+
+WORDS = [
+    'samsung', 'apple', 'galaxy', 'iphone', 'charger', 'cable', 'adapter', 'case', 'cover',
+    'screen', 'glass', 'power', 'bank', 'wireless', 'earbuds', 'headset', 'speaker', 'mouse',
+    'keyboard', 'usb', 'lightning', 'typec', 'fast', 'mini', 'pro', 'max', 'ultra', 'lite',
+    'black', 'white', 'blue', 'red', 'anker', 'baseus', 'spigen', 'xiaomi', 'huawei', 'oppo',
+]
+
+class Command(BaseCommand):
+    help = "Time indexed product search against icontains scans for growing catalog sizes (rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 50000])
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(f"{'products':>10} {'indexed ms':>12} {'icontains ms':>14}")
+        with transaction.atomic():
+            created = 0
+            for size in sorted(options['sizes']):
+                self._fill(rng, size - created)
+                created = size
+
+                queries = self._sample_queries(rng, options['queries'])
+                indexed = self._time(self._indexed, queries)
+                scan = self._time(self._scan, queries)
+                self.stdout.write(f"{size:>10} {indexed:>12.2f} {scan:>14.2f}")
+
+            transaction.set_rollback(True)
+
+        if search_products(Product.objects.none(), ['x']) is None:
+            self.stdout.write(self.style.WARNING("No search index on this database; both columns are icontains scans."))
+
+    def _fill(self, rng, count):
+        batch = []
+        for _ in range(max(count, 0)):
+            batch.append(Product(
+                unique_id=uuid.uuid4().hex[:12].upper(),
+                item_name=' '.join(rng.sample(WORDS, 3)),
+                brand=rng.choice(WORDS),
+                serial_number=uuid.uuid4().hex[:10],
+                rate=rng.randint(1, 500),
+            ))
+        Product.objects.bulk_create(batch, batch_size=1000)
+
+    def _sample_queries(self, rng, count):
+        """What a counter types: a name prefix or the start of a serial number."""
+        ids = list(Product.objects.values_list('id', flat=True))
+        queries = []
+        for product in Product.objects.filter(id__in=rng.sample(ids, min(count, len(ids)))):
+            if rng.random() < 0.5:
+                terms = product.serial_number[:6].split()
+            else:
+                terms = [word[:4] for word in product.item_name.split()]
+            # Products without a serial number (or name words) have nothing to type
+            if terms:
+                queries.append(terms)
+        return queries
+
+    def _indexed(self, terms):
+        queryset = search_products(Product.objects.all(), terms)
+        if queryset is None:
+            return self._scan(terms)
+        return queryset.order_by('search_rank')
+
+    def _scan(self, terms):
+        queryset = Product.objects.all()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(item_name__icontains=term) | Q(brand__icontains=term) | Q(serial_number__icontains=term)
+            )
+        return queryset
+
+    def _time(self, build, queries):
+        """Average milliseconds to fetch the first page of results."""
+        start = time.perf_counter()
+        for terms in queries:
+            list(build(terms).values_list('id', flat=True)[:20])
+        return (time.perf_counter() - start) * 1000 / len(queries)
@@ -0,0 +1,10 @@
+# products/management/commands/compact_catalog_changes.py
+from django.core.management.base import BaseCommand
+from products.sync import compact_changes
+
+class Command(BaseCommand):
+    help = "Drop superseded catalog sync journal entries, keeping the newest one per product (recent entries are kept)"
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} superseded sync entries"))
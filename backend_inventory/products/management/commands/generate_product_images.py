@@ -0,0 +1,63 @@
+# products/management/commands/generate_product_images.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from PIL import Image
+
+from products import images
+from products.models import Product
+
+class Command(BaseCommand):
+    help = "Backfill thumbnail/medium WebP variants for product images, rendering in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Render processes (default: CPU count)")
+        parser.add_argument('--batch-size', type=int, default=64, help="Images read into memory at a time")
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if not options['force']:
+            products = products.filter(Q(image_thumbnail__isnull=True) | Q(image_thumbnail=''))
+
+        total = products.count()
+        done = failed = 0
+        pool = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        with pool:
+            batches = products.iterator(chunk_size=options['batch_size'])
+            while True:
+                batch = list(islice(batches, options['batch_size']))
+                if not batch:
+                    break
+
+                # File reads stay in this process; workers only get bytes to resize
+                jobs = []
+                for product in batch:
+                    try:
+                        with product.image.open('rb') as f:
+                            content = f.read()
+                    except OSError as e:
+                        self.stderr.write(f"{product.unique_id}: cannot read {product.image.name} ({e})")
+                        failed += 1
+                        continue
+                    jobs.append((product, pool.submit(images.render_variants, content)))
+
+                for product, future in jobs:
+                    try:
+                        rendered = future.result()
+                    except (OSError, Image.DecompressionBombError) as e:
+                        self.stderr.write(f"{product.unique_id}: cannot decode {product.image.name} ({e})")
+                        failed += 1
+                        continue
+                    images.store_variants(product, rendered)
+                    done += 1
+
+                self.stdout.write(f"{done + failed}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} products ({failed} failed)"))
@@ -0,0 +1,45 @@
+# products/management/commands/import_products.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import ImportFormatError, import_products
+
+class Command(BaseCommand):
+    help = "Bulk import products (and qty:<location> stock columns) from a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--create-categories', action='store_true')
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing")
+        parser.add_argument('--errors', help="Write the per-row error report to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_products(
+                    fileobj, options['path'],
+                    chunk_size=options['chunk_size'],
+                    create_categories=options['create_categories'],
+                    dry_run=options['dry_run'],
+                )
+        except ImportFormatError as e:
+            if e.report:
+                raise CommandError(
+                    f"{e} Rows up to {e.report['last_row']} were processed: "
+                    f"{e.report['created']} products created, {len(e.report['errors'])} rows rejected."
+                )
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['errors']:
+            with open(options['errors'], 'w') as out:
+                json.dump(report['errors'], out, indent=2)
+        else:
+            for error in report['errors'][:20]:
+                self.stderr.write(f"Row {error['row']}: {error['errors']}")
+
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} of {report['rows']} products ({len(report['errors'])} rows rejected)"
+        ))
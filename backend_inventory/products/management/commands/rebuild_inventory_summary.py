@@ -0,0 +1,10 @@
+# products/management/commands/rebuild_inventory_summary.py
+from django.core.management.base import BaseCommand
+from products.summary import rebuild_inventory_summary
+
+class Command(BaseCommand):
+    help = "Recompute the InventorySummary table from current stock"
+
+    def handle(self, *args, **options):
+        rows = rebuild_inventory_summary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt inventory summary ({rows} rows)"))
@@ -0,0 +1,51 @@
+# products/management/commands/rebuild_supplier_spend.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date
+
+from products import analytics
+from products.models import SupplierSpend
+
+def _compute(month):
+    # Each thread has its own connection; close it when the month is done
+    try:
+        return analytics.compute_month(month)
+    finally:
+        connections.close_all()
+
+class Command(BaseCommand):
+    help = "Recompute the monthly SupplierSpend rollups, aggregating months in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first', help="First month, YYYY-MM (default: first purchase)")
+        parser.add_argument('--to', dest='last', help="Last month, YYYY-MM (default: last purchase)")
+        parser.add_argument('--workers', type=int, default=4, help="Months aggregated concurrently")
+
+    def _month(self, value):
+        day = parse_date(f'{value}-01') if value else None
+        if value and day is None:
+            raise CommandError(f"Invalid month '{value}', use YYYY-MM.")
+        return day
+
+    def handle(self, *args, **options):
+        first, last = self._month(options['first']), self._month(options['last'])
+        if first is None and last is None:
+            months = analytics.purchase_months()
+            # Nothing outside the purchase range should survive a full rebuild
+            SupplierSpend.objects.exclude(month__in=months).delete()
+        else:
+            known = analytics.purchase_months()
+            first = first or (known[0] if known else last)
+            last = last or (known[-1] if known else first)
+            if first > last:
+                raise CommandError("--from must not be after --to.")
+            months = list(analytics.months_between(first, last))
+
+        # Aggregation queries run in threads; rows are written from this one
+        rows = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for month, cells in zip(months, pool.map(_compute, months)):
+                rows += analytics.store_month(month, cells)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt supplier spend for {len(months)} months ({rows} rows)"))
@@ -0,0 +1,19 @@
+# products/management/commands/snapshot_stock_balances.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from products.stock import SNAPSHOT_LAG, take_snapshot
+
+class Command(BaseCommand):
+    help = "Snapshot per-(product, location) balances that moved since the last run (schedule e.g. nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--lag', type=int, default=int(SNAPSHOT_LAG.total_seconds()),
+            help="Seconds a movement must be old before it is snapshotted, so it is known to be committed",
+        )
+
+    def handle(self, *args, **options):
+        rows = take_snapshot(chunk_size=options['chunk_size'], lag=timedelta(seconds=options['lag']))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} balance snapshots"))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:53
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+
+def populate_summary(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductLocation = apps.get_model('products', 'ProductLocation')
+    InventorySummary = apps.get_model('products', 'InventorySummary')
+
+    stock = ProductLocation.objects.values('location_id', 'product__category_id').annotate(
+        units=Sum('quantity'),
+        value=Sum(F('quantity') * F('product__rate'), output_field=DecimalField(max_digits=18, decimal_places=2)),
+        active=Count('id', filter=Q(product__active=True, quantity__gt=0)),
+    )
+    rows = [
+        InventorySummary(
+            location_id=row['location_id'],
+            category_id=row['product__category_id'],
+            active_products=row['active'],
+            total_units=row['units'] or 0,
+            stock_value=row['value'] or Decimal('0'),
+        )
+        for row in stock
+    ]
+    for row in Product.objects.filter(active=True).values('category_id').annotate(active=Count('id')):
+        rows.append(InventorySummary(category_id=row['category_id'], active_products=row['active']))
+    InventorySummary.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_product_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_products', models.IntegerField(default=0)),
+                ('total_units', models.BigIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='products.category')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='products.location')),
+            ],
+            options={
+                'unique_together': {('location', 'category')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_medium',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='product_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='product_images/variants/'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    # One entry per existing product so a client syncing from 0 gets the whole catalog
+    Product = apps.get_model('products', 'Product')
+    CatalogChange = apps.get_model('products', 'CatalogChange')
+    CatalogChange.objects.bulk_create(
+        (CatalogChange(product_id=pk) for pk in Product.objects.order_by('id').values_list('id', flat=True).iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(db_index=True)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:21
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def seed_spend(apps, schema_editor):
+    # Same cells products.analytics maintains, built once from existing purchases
+    Purchase = apps.get_model('products', 'Purchase')
+    PurchaseItemLocation = apps.get_model('products', 'PurchaseItemLocation')
+    SupplierSpend = apps.get_model('products', 'SupplierSpend')
+
+    cells = defaultdict(lambda: [Decimal('0'), Decimal('0'), 0, 0])
+    for row in Purchase.objects.annotate(month=TruncMonth('purchase_date')).values(
+        'supplier_name', 'purchased_by', 'month'
+    ).annotate(spend=Sum('total_amount'), discount=Sum('discount'), invoices=Count('id')).order_by():
+        cell = cells[row['supplier_name'], row['purchased_by'] or '', row['month']]
+        cell[0] += row['spend'] or 0
+        cell[1] += row['discount'] or 0
+        cell[3] += row['invoices']
+
+    prefix = 'purchase_item__purchase__'
+    for row in PurchaseItemLocation.objects.annotate(month=TruncMonth(prefix + 'purchase_date')).values(
+        prefix + 'supplier_name', prefix + 'purchased_by', 'month'
+    ).annotate(units=Sum('quantity')).order_by():
+        cells[row[prefix + 'supplier_name'], row[prefix + 'purchased_by'] or '', row['month']][2] += row['units']
+
+    SupplierSpend.objects.bulk_create(
+        [
+            SupplierSpend(
+                supplier_name=supplier_name, purchased_by=purchased_by, month=month,
+                spend=spend, discount=discount, units=units, invoices=invoices,
+            )
+            for (supplier_name, purchased_by, month), (spend, discount, units, invoices) in cells.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_purchase_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier_name', models.CharField(max_length=100)),
+                ('purchased_by', models.CharField(blank=True, max_length=20)),
+                ('month', models.DateField()),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('units', models.BigIntegerField(default=0)),
+                ('invoices', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'supplier_name'], name='supplier_spend_month_idx')],
+                'unique_together': {('supplier_name', 'purchased_by', 'month')},
+            },
+        ),
+        migrations.RunPython(seed_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:34
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    # Concurrent first writes could create several rows for a NULL key; fold them into one
+    InventorySummary = apps.get_model('products', 'InventorySummary')
+    keep = {}
+    for row in InventorySummary.objects.order_by('id'):
+        key = (row.location_id, row.category_id)
+        first = keep.setdefault(key, row)
+        if first is row:
+            continue
+        first.active_products += row.active_products
+        first.total_units += row.total_units
+        first.stock_value += row.stock_value
+        first.save(update_fields=['active_products', 'total_units', 'stock_value'])
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_supplierspend'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='inventorysummary',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorysummary',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('location', models.Value(0)), django.db.models.functions.comparison.Coalesce('category', models.Value(0)), name='inventory_summary_key_uniq'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 import os
 import uuid
+from decimal import Decimal
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from io import BytesIO
 from django.core.files import File
@@ -11,6 +14,8 @@ from PIL import Image
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .images import store_invoice_image
 
 User = get_user_model()
 
@@ -42,6 +47,25 @@ def barcode_image_upload_path(instance, filename):
     new_filename = f"{uuid.uuid4()}{ext}"
     return f'barcodes/{new_filename}'
 
+class ProductQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate `stock_total` and prefetch locations so serializing a page of
+        products costs a fixed number of queries.
+        """
+        return self.select_related('category').with_locations().with_stock_total()
+
+    def with_locations(self):
+        return self.prefetch_related(
+            Prefetch('product_locations', queryset=ProductLocation.objects.select_related('location'))
+        )
+
+    def with_stock_total(self):
+        return self.annotate(stock_total=Coalesce(Subquery(
+            ProductLocation.objects.filter(product=OuterRef('pk'))
+            .values('product').annotate(total=Sum('quantity')).values('total')
+        ), 0))
+
 class Product(models.Model):
     unique_id = models.CharField(max_length=64, unique=True, editable=True, validators=[barcode_validator],)
     item_name = models.CharField(max_length=200)
@@ -57,10 +81,18 @@ class Product(models.Model):
     active = models.BooleanField(default=True)
 
     image = models.ImageField(upload_to=product_image_upload_path, blank=True, null=True)
+    # Resized WebP/JPEG copies of `image`, written by products.images
+    image_thumbnail = models.ImageField(upload_to='product_images/variants/', blank=True, null=True, editable=False)
+    image_medium = models.ImageField(upload_to='product_images/variants/', blank=True, null=True, editable=False)
     description = models.TextField(blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['-created_at', 'id'], name='product_created_id_idx')]
+
     def total_quantity(self):
         return sum(loc.quantity for loc in self.product_locations.all())
         
@@ -85,11 +117,126 @@ class ProductLocation(models.Model):
     def __str__(self):
         return f"{self.product.item_name} at {self.location.name} - Qty: {self.quantity}"
 
+class InventorySummary(models.Model):
+    """
+    Running stock totals per (location, category), kept up to date by
+    products.summary so the dashboard never has to scan the catalog.
+    Rows without a location hold the catalog-wide active product count
+    of a category.
+    """
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, null=True, blank=True, related_name='summaries')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='summaries')
+    active_products = models.IntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    stock_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # NULLs are distinct in a plain unique index, so compare the keys
+            # with NULL mapped to 0 to keep catalog and uncategorized rows unique too
+            models.UniqueConstraint(
+                Coalesce('location', Value(0)), Coalesce('category', Value(0)),
+                name='inventory_summary_key_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.location or 'Catalog'} / {self.category or 'Uncategorized'}"
+
+class CatalogChange(models.Model):
+    """
+    Append-only journal for catalog delta sync: one row each time a product,
+    its stock rows or its section prices change. The id is the sync token.
+    product_id is a plain integer so entries outlive deleted products and
+    act as their tombstones.
+    """
+    product_id = models.BigIntegerField(db_index=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.pk} product {self.product_id}"
+
+class ModelVersion(models.Model):
+    """
+    Change counter per model (keyed by app_label.model_name), bumped on every
+    save/delete. List endpoints derive their ETags from it.
+    """
+    label = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of ProductLocation quantity changes, written by
+    products.stock. Foreign keys carry no DB constraint so history outlives
+    deleted products and locations.
+    """
+    PURCHASE = 'purchase'
+    SALE = 'sale'
+    ADJUSTMENT = 'adjustment'
+    IMPORT = 'import'
+    SOURCE_CHOICES = [
+        (PURCHASE, 'Purchase'),
+        (SALE, 'Sale'),
+        (ADJUSTMENT, 'Adjustment'),
+        (IMPORT, 'Import'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stock_movements')
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stock_movements')
+    delta = models.IntegerField()
+    source_type = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=ADJUSTMENT)
+    source_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'location', 'created_at'], name='movement_product_loc_idx'),
+            models.Index(fields=['source_type', 'source_id'], name='movement_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.location_id} {self.delta:+d} ({self.source_type})"
+
+class StockSnapshot(models.Model):
+    """
+    Balance of one (product, location) as of ledger entry `last_movement_id`.
+    Written periodically by `snapshot_stock_balances`, only for pairs that
+    moved since the previous run.
+    """
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stock_snapshots')
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stock_snapshots')
+    quantity = models.BigIntegerField()
+    last_movement_id = models.BigIntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'location', 'taken_at'], name='snapshot_product_loc_idx')]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.location_id} = {self.quantity} ({self.taken_at:%Y-%m-%d %H:%M})"
+
 def invoice_image_upload_path(instance, filename):
     ext = os.path.splitext(filename)[1]
     new_filename = f"{uuid.uuid4()}{ext}"
     return f'invoices/{new_filename}'
 
+MONEY = DecimalField(max_digits=15, decimal_places=2)
+
+def _line_amount():
+    return Sum(F('quantity') * F('purchase_item__rate'), output_field=MONEY)
+
+class PurchaseItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate `total_quantity` and `total_price` for each line."""
+        return self.annotate(
+            total_quantity=Coalesce(Subquery(
+                PurchaseItemLocation.objects.filter(purchase_item=OuterRef('pk'))
+                .values('purchase_item').annotate(total=Sum('quantity')).values('total')
+            ), 0),
+        ).annotate(total_price=ExpressionWrapper(F('total_quantity') * F('rate'), output_field=MONEY))
 
 class Purchase(models.Model):
     PAYMENT_CHOICES = [
@@ -123,14 +270,26 @@ class Purchase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-purchase_date', 'id'], name='purchase_date_id_idx'),
+            models.Index(fields=['purchased_by', '-purchase_date'], name='purchase_by_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.supplier_name} - {self.invoice_number or 'No Invoice'}"
 
+    def save(self, *args, **kwargs):
+        # New uploads are stored once per distinct content; purchases may share a file
+        if self.invoice_image and not self.invoice_image._committed:
+            self.invoice_image = store_invoice_image(self.invoice_image)
+        super().save(*args, **kwargs)
+
     def calculate_total_amount(self):
-        total = 0
-        for item in self.items.all():
-            for loc in item.item_locations.all():
-                total += item.rate * loc.quantity
+        # Always aggregated fresh: callers run it right after editing the lines
+        total = PurchaseItemLocation.objects.filter(purchase_item__purchase=self).aggregate(
+            total=Coalesce(_line_amount(), Decimal('0'), output_field=MONEY)
+        )['total']
         return total - self.discount
 
 class PurchaseItem(models.Model):
@@ -145,13 +304,22 @@ class PurchaseItem(models.Model):
     product_variant = models.CharField(max_length=200, blank=True)
     serial_number = models.CharField(max_length=20, blank=True)
 
+    objects = PurchaseItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.product_name} - {self.purchase}"
 
     def get_total_quantity(self):
-        return sum(loc.quantity for loc in self.item_locations.all())
+        # Prefer the with_totals() annotation, then prefetched rows, then one aggregate
+        if hasattr(self, 'total_quantity'):
+            return self.total_quantity
+        if 'item_locations' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(loc.quantity for loc in self.item_locations.all())
+        return self.item_locations.aggregate(total=Coalesce(Sum('quantity'), 0))['total']
 
     def get_total_price(self):
+        if hasattr(self, 'total_price'):
+            return self.total_price
         return self.get_total_quantity() * self.rate
 
     def save(self, *args, **kwargs):
@@ -170,6 +338,7 @@ class PurchaseItem(models.Model):
             self.product.save()
 
 class PurchaseItemLocation(models.Model):
+    # Stock is applied in batches by products.purchases, not per row on save
     purchase_item = models.ForeignKey(PurchaseItem, on_delete=models.CASCADE, related_name='item_locations')
     location = models.ForeignKey('products.Location', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
@@ -180,25 +349,23 @@ class PurchaseItemLocation(models.Model):
     def __str__(self):
         return f"{self.purchase_item.product} @ {self.location} - Qty: {self.quantity}"
 
-    def save(self, *args, **kwargs):
-        is_new = self._state.adding
-
-        # For updates, calculate the difference
-        if not is_new:
-            previous = PurchaseItemLocation.objects.get(pk=self.pk)
-            quantity_diff = self.quantity - previous.quantity
-        else:
-            quantity_diff = self.quantity
-
-        super().save(*args, **kwargs)
+class SupplierSpend(models.Model):
+    """
+    Monthly purchase totals per (supplier_name, purchased_by), kept up to
+    date by products.analytics so spend reports never scan the purchases.
+    `month` is the first day of the month; an unset purchased_by is ''.
+    """
+    supplier_name = models.CharField(max_length=100)
+    purchased_by = models.CharField(max_length=20, blank=True)
+    month = models.DateField()
+    spend = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    units = models.BigIntegerField(default=0)
+    invoices = models.IntegerField(default=0)
 
-        # Update ProductLocation stock
-        product_location, _ = ProductLocation.objects.get_or_create(
-            product=self.purchase_item.product,
-            location=self.location
-        )
-        product_location.quantity += quantity_diff
-        product_location.save()
+    class Meta:
+        unique_together = ('supplier_name', 'purchased_by', 'month')
+        indexes = [models.Index(fields=['month', 'supplier_name'], name='supplier_spend_month_idx')]
 
-        # Update total on the Purchase
-        self.purchase_item.purchase.save()
\ No newline at end of file
+    def __str__(self):
+        return f"{self.supplier_name} / {self.purchased_by or '-'} {self.month:%Y-%m}"
@@ -0,0 +1,69 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Cursor pagination that only kicks in when the client asks for it with
+    `?page_size=` or `?cursor=`, so existing callers expecting a plain list
+    keep working.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ProductCursorPagination(OptionalCursorPagination):
+    """
+    Searches are paged in rank order by `?offset=`: a created_at cursor
+    would throw the ranking away. Other lists use the cursor as usual.
+    """
+    ordering = ('-created_at', 'id')
+    offset_query_param = 'offset'
+    ranked = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+            return super().paginate_queryset(queryset, request, view)
+
+        params = request.query_params
+        if not any(name in params for name in (self.cursor_query_param, self.page_size_query_param, self.offset_query_param)):
+            return None
+        try:
+            self.offset = max(int(params.get(self.offset_query_param, 0)), 0)
+        except ValueError:
+            raise ValidationError({self.offset_query_param: 'A non-negative integer is required.'})
+
+        self.ranked = True
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        results = list(queryset[self.offset:self.offset + self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        return results[:self.page_size]
+
+    def get_paginated_response(self, data):
+        if not self.ranked:
+            return super().get_paginated_response(data)
+        next_url = previous_url = None
+        if self.has_next:
+            next_url = replace_query_param(self.base_url, self.offset_query_param, self.offset + self.page_size)
+        if self.offset:
+            previous_url = replace_query_param(self.base_url, self.offset_query_param, max(self.offset - self.page_size, 0))
+        return Response({'next': next_url, 'previous': previous_url, 'results': data})
+
+
+class MovementCursorPagination(OptionalCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class PurchaseCursorPagination(OptionalCursorPagination):
+    ordering = ('-purchase_date', 'id')
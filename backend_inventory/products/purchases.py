@@ -0,0 +1,206 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from . import stock, summary, sync
+from .cache import scan_cache
+from .models import Product, PurchaseItem, PurchaseItemLocation, StockMovement
+
+SNAPSHOT_FIELDS = {
+    'product_name': 'item_name',
+    'product_barcode': 'unique_id',
+    'product_brand': 'brand',
+    'product_variant': 'variants',
+    'serial_number': 'serial_number',
+}
+
+def snapshot_product(item_data):
+    """Copy the product's descriptive fields onto a purchase line before saving it."""
+    product = item_data.get('product')
+    if product:
+        for field, source in SNAPSHOT_FIELDS.items():
+            item_data[field] = getattr(product, source) or ''
+    return item_data
+
+def purchase_stock(purchase):
+    """{(product_id, location_id): quantity} the purchase currently puts into stock."""
+    rows = PurchaseItemLocation.objects.filter(
+        purchase_item__purchase=purchase, purchase_item__product__isnull=False
+    ).values('purchase_item__product_id', 'location_id').annotate(total=Sum('quantity'))
+    return {(row['purchase_item__product_id'], row['location_id']): row['total'] for row in rows}
+
+def stock_difference(before, after):
+    """Net per-(product, location) change between two purchase_stock() results."""
+    deltas = defaultdict(int)
+    for key, quantity in after.items():
+        deltas[key] += quantity
+    for key, quantity in before.items():
+        deltas[key] -= quantity
+    return {key: delta for key, delta in deltas.items() if delta}
+
+def apply_purchase_stock(purchase, deltas):
+    """Apply the purchase's stock deltas as one locked batch, logged against the purchase."""
+    with stock.movement_source(StockMovement.PURCHASE, purchase.pk):
+        return stock.apply_deltas(deltas)
+
+def update_product_rates(items):
+    """
+    Products take the rate of their latest purchase line. Products whose rate
+    actually changes are written with one bulk_update, and the summary, sync
+    journal and scan cache are brought up to date for the whole batch.
+    """
+    rates = {}
+    for item in items:
+        if item.product is not None:
+            rates[item.product.pk] = (item.product, item.rate)
+    changed = [product for product, rate in rates.values() if product.rate != rate]
+    if not changed:
+        return
+
+    # bulk_update skips the Product signals, so collect what they would have read
+    previous = {
+        row['id']: row for row in Product.objects.filter(pk__in=[p.pk for p in changed]).values(
+            'id', 'unique_id', 'rate', 'category_id', 'active'
+        )
+    }
+    for product in changed:
+        product.rate = rates[product.pk][1]
+    Product.objects.bulk_update(changed, ['rate'])
+
+    summary.apply_product_changes([(product, previous[product.pk]) for product in changed if product.pk in previous])
+    sync.record_changes(product.pk for product in changed)
+    unique_ids = [product.unique_id for product in changed]
+    transaction.on_commit(lambda: scan_cache.invalidate(unique_ids))
+
+def create_items(purchase, items_data):
+    """
+    Bulk-create purchase lines and their location rows. Returns the
+    {(product_id, location_id): quantity} stock the new lines add.
+    """
+    items, locations = [], []
+    for item_data in items_data:
+        item_data.pop('id', None)
+        locs_data = item_data.pop('item_locations', [])
+        item = PurchaseItem(purchase=purchase, **snapshot_product(item_data))
+        items.append(item)
+        locations.append(locs_data)
+
+    PurchaseItem.objects.bulk_create(items)
+    rows = [
+        PurchaseItemLocation(purchase_item=item, location=loc_data['location'], quantity=loc_data['quantity'])
+        for item, locs_data in zip(items, locations)
+        for loc_data in locs_data
+    ]
+    PurchaseItemLocation.objects.bulk_create(rows)
+    update_product_rates(items)
+
+    added = defaultdict(int)
+    for row in rows:
+        if row.purchase_item.product_id:
+            added[row.purchase_item.product_id, row.location_id] += row.quantity
+    return dict(added)
+
+def _line_stock(lines):
+    """{(product_id, location_id): quantity} for [(product_id, [(location_id, quantity), ...]), ...]."""
+    totals = defaultdict(int)
+    for product_id, locations in lines:
+        if product_id:
+            for location_id, quantity in locations:
+                totals[product_id, location_id] += quantity
+    return totals
+
+def _match_lines(existing, items_data):
+    """
+    Pair each incoming line with an existing one: by id first, then any
+    id-less line with an unclaimed line of the same product. Unpaired
+    incoming lines get None.
+    """
+    claimed = set()
+    plan = []
+    for item_data in items_data:
+        item = existing.get(item_data.pop('id', None))
+        if item is not None and item.pk not in claimed:
+            claimed.add(item.pk)
+        else:
+            item = None
+        plan.append([item, item_data])
+
+    leftovers = defaultdict(list)
+    for pk, item in existing.items():
+        if pk not in claimed:
+            leftovers[item.product_id].append(item)
+    for entry in plan:
+        product = entry[1].get('product')
+        candidates = leftovers[product.pk if product else None]
+        if entry[0] is None and candidates:
+            entry[0] = candidates.pop(0)
+            claimed.add(entry[0].pk)
+    return plan, [pk for pk in existing if pk not in claimed]
+
+def sync_items(purchase, items_data):
+    """
+    Reconcile the purchase's lines with `items_data` in place: matched lines
+    and location rows are updated only where they differ, new ones are
+    bulk-created and missing ones deleted. Returns the net
+    {(product_id, location_id): delta} the edit makes to stock.
+    """
+    existing = {item.pk: item for item in purchase.items.prefetch_related('item_locations')}
+    before = _line_stock(
+        (item.product_id, [(loc.location_id, loc.quantity) for loc in item.item_locations.all()])
+        for item in existing.values()
+    )
+
+    plan, removed = _match_lines(existing, items_data)
+
+    item_updates, new_items = [], []
+    loc_updates, loc_creates, loc_deletes = [], [], []
+    after = []
+    for item, item_data in plan:
+        locs_data = item_data.pop('item_locations', [])
+        product = item_data.get('product')
+        after.append((product.pk if product else None, [(l['location'].pk, l['quantity']) for l in locs_data]))
+
+        if item is None:
+            new_items.append((PurchaseItem(purchase=purchase, **snapshot_product(item_data)), locs_data))
+            continue
+
+        changed = item.product_id != (product.pk if product else None) or item.rate != item_data['rate']
+        if item.product_id != (product.pk if product else None):
+            for field, value in snapshot_product({'product': product}).items():
+                setattr(item, field, value)
+        item.product = product
+        item.rate = item_data['rate']
+        if changed:
+            item_updates.append(item)
+
+        current = {loc.location_id: loc for loc in item.item_locations.all()}
+        for loc_data in locs_data:
+            row = current.pop(loc_data['location'].pk, None)
+            if row is None:
+                loc_creates.append(PurchaseItemLocation(purchase_item=item, location=loc_data['location'], quantity=loc_data['quantity']))
+            elif row.quantity != loc_data['quantity']:
+                row.quantity = loc_data['quantity']
+                loc_updates.append(row)
+        loc_deletes.extend(row.pk for row in current.values())
+
+    if removed:
+        PurchaseItem.objects.filter(pk__in=removed).delete()
+    if loc_deletes:
+        PurchaseItemLocation.objects.filter(pk__in=loc_deletes).delete()
+    if item_updates:
+        PurchaseItem.objects.bulk_update(item_updates, ['product', 'rate', *SNAPSHOT_FIELDS])
+    if loc_updates:
+        PurchaseItemLocation.objects.bulk_update(loc_updates, ['quantity'])
+    if new_items:
+        PurchaseItem.objects.bulk_create([item for item, _ in new_items])
+        loc_creates.extend(
+            PurchaseItemLocation(purchase_item=item, location=loc_data['location'], quantity=loc_data['quantity'])
+            for item, locs_data in new_items
+            for loc_data in locs_data
+        )
+    if loc_creates:
+        PurchaseItemLocation.objects.bulk_create(loc_creates)
+
+    update_product_rates([item for item, _ in plan if item is not None] + [item for item, _ in new_items])
+    return stock_difference(before, _line_stock(after))
@@ -0,0 +1,129 @@
+import re
+
+from django.db import connection
+from rest_framework import filters
+
+# Fields indexed for product search, in ranking weight order
+SEARCH_FIELDS = ('item_name', 'brand', 'serial_number')
+
+# SQLite: external-content FTS5 table kept in sync with products_product by
+# triggers, so bulk writes that skip Product.save() are indexed too.
+FTS_TABLE = 'products_product_fts'
+
+SQLITE_CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        item_name, brand, serial_number,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, item_name, brand, serial_number)
+        VALUES (new.id, new.item_name, new.brand, new.serial_number);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, brand, serial_number)
+        VALUES ('delete', old.id, old.item_name, old.brand, old.serial_number);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF item_name, brand, serial_number ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_name, brand, serial_number)
+        VALUES ('delete', old.id, old.item_name, old.brand, old.serial_number);
+        INSERT INTO {FTS_TABLE}(rowid, item_name, brand, serial_number)
+        VALUES (new.id, new.item_name, new.brand, new.serial_number);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# PostgreSQL: trigram GIN indexes make the icontains lookups index scans.
+POSTGRES_CREATE = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX IF NOT EXISTS product_{field}_trgm ON products_product USING gin (UPPER({field}::text) gin_trgm_ops)"
+    for field in SEARCH_FIELDS
+]
+
+POSTGRES_DROP = [f"DROP INDEX IF EXISTS product_{field}_trgm" for field in SEARCH_FIELDS]
+
+_fts_ready = {}
+
+def has_fts_index():
+    """Whether the FTS5 table exists on the default SQLite database."""
+    if connection.vendor != 'sqlite':
+        return False
+    key = connection.settings_dict['NAME']
+    if key not in _fts_ready:
+        _fts_ready[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready[key]
+
+def fts_query(terms):
+    """Build an FTS5 query that prefix-matches every term."""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+def search_products(queryset, terms):
+    """
+    Narrow a Product queryset to `terms` using the search index and annotate
+    `search_rank` (lower is better). Returns None when no index is available,
+    and the queryset unchanged when no term has a letter or digit to match.
+    """
+    terms = [term for term in terms if re.search(r'\w', term)]
+    if not terms:
+        return queryset
+
+    if has_fts_index():
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = products_product.id', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_query(terms)],
+            select={'search_rank': f'bm25({FTS_TABLE}, 10.0, 5.0, 1.0)'},
+        )
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models import Q
+        from django.db.models.functions import Greatest
+
+        for term in terms:
+            queryset = queryset.filter(
+                Q(item_name__icontains=term) | Q(brand__icontains=term) | Q(serial_number__icontains=term)
+            )
+        term = ' '.join(terms)
+        return queryset.annotate(search_rank=-Greatest(
+            *(TrigramWordSimilarity(term, field) for field in SEARCH_FIELDS)
+        ))
+
+    return None
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    `?search=` backed by the product search index, ranked best match first
+    unless the client asks for an explicit `?ordering=`. Falls back to the
+    plain icontains search when no index exists.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        results = search_products(queryset, terms)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if results is queryset:
+            # Only punctuation: nothing to search for
+            return queryset
+
+        if filters.OrderingFilter.ordering_param in request.query_params:
+            return results
+        return results.order_by('search_rank', *results.query.order_by)
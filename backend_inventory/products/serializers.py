@@ -1,12 +1,15 @@
 from itertools import product
 from rest_framework import serializers
 import json
-from .models import Product, Category, Location, ProductLocation, Purchase, PurchaseItem, PurchaseItemLocation
-from django.db.models import Sum
+from .models import Product, Category, Location, ProductLocation, Purchase, PurchaseItem, PurchaseItemLocation, StockMovement
+from django.db.models import Sum, prefetch_related_objects
 from rest_framework.validators import UniqueValidator
 import uuid
 from rest_framework.exceptions import ValidationError
 from django.db import transaction
+from . import purchases, stock
+from .cache import scan_cache
+from .fieldsets import SparseFieldsetMixin
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,7 +30,7 @@ class ProductLocationSerializer(serializers.ModelSerializer):
         model = ProductLocation
         fields = ['location', 'location_id', 'quantity']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     unique_id = serializers.CharField(
         validators=[UniqueValidator(queryset=Product.objects.all())],
         required=False
@@ -46,13 +49,17 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'unique_id', 'item_name', 'brand', 'serial_number', 'variants',
-            'category', 'category_id', 'rate', 'active', 'image', 'created_at', 
-            'locations', 'total_quantity', 'description'
+            'category', 'category_id', 'rate', 'active', 'image', 'image_thumbnail', 'image_medium',
+            'created_at', 'locations', 'total_quantity', 'description'
             ]
 
         read_only_fields = ['id', 'unique_id', 'created_at']
+        expandable_fields = {'category': (CategorySerializer, {})}
         
     def get_total_quantity(self, obj):
+        # Annotated by Product.objects.with_stock(); fall back for fresh instances
+        if hasattr(obj, 'stock_total'):
+            return obj.stock_total
         return obj.product_locations.aggregate(total=Sum('quantity'))['total'] or 0
 
     def create(self, validated_data):
@@ -84,6 +91,7 @@ class ProductSerializer(serializers.ModelSerializer):
         
         return product
 
+    @transaction.atomic
     def update(self, instance, validated_data):        
         request = self.context.get('request')
         
@@ -103,24 +111,94 @@ class ProductSerializer(serializers.ModelSerializer):
         instance.save()
 
         if locations_data is not None:
-            # Delete old locations and add new ones
-            instance.product_locations.all().delete()
-            for loc_data in locations_data:
-                ProductLocation.objects.create(
-                    product=instance,
-                    location_id=loc_data['location_id'],
-                    quantity=loc_data['quantity']
-                )
+            self.sync_locations(instance, locations_data)
+            # The annotation from with_stock() is stale now
+            instance.__dict__.pop('stock_total', None)
         
         return instance
+
+    def sync_locations(self, product, locations_data):
+        """
+        Bring the product's stock rows in line with `locations_data`: changed
+        quantities are bulk-updated, new locations bulk-created and only the
+        locations that were left out are deleted. Untouched rows keep their id.
+        """
+        incoming = {}
+        for loc_data in locations_data:
+            try:
+                incoming[int(loc_data['location_id'])] = int(loc_data['quantity'])
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError({'locations': 'Each location needs a location_id and a quantity.'})
+            if incoming[int(loc_data['location_id'])] < 0:
+                raise serializers.ValidationError({'locations': 'Quantity cannot be negative.'})
+
+        existing = {
+            pl.location_id: pl
+            for pl in ProductLocation.objects.select_for_update().filter(product=product)
+        }
+
+        to_create, to_update, changes = [], [], []
+        for location_id, quantity in incoming.items():
+            pl = existing.get(location_id)
+            if pl is None:
+                to_create.append(ProductLocation(product=product, location_id=location_id, quantity=quantity))
+                changes.append((product.id, location_id, 0, quantity))
+            elif pl.quantity != quantity:
+                changes.append((product.id, location_id, pl.quantity, quantity))
+                pl.quantity = quantity
+                to_update.append(pl)
+
+        removed = [pl.pk for location_id, pl in existing.items() if location_id not in incoming]
+        if removed:
+            # Deletes go through the model signals, which do the stock bookkeeping
+            ProductLocation.objects.filter(pk__in=removed).delete()
+        if to_update:
+            ProductLocation.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            ProductLocation.objects.bulk_create(to_create)
+
+        # bulk_update/bulk_create skip signals
+        if changes:
+            stock.stock_changed(changes)
+            transaction.on_commit(lambda: scan_cache.invalidate([product.unique_id]))
     
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'location', 'delta', 'source_type', 'source_id', 'created_at']
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves ids from context['preloaded'][model] when the parent serializer
+    fetched them in bulk, instead of one query per nested row.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.get_queryset().model)
+        if preloaded is not None and not isinstance(data, bool):
+            try:
+                obj = preloaded.get(int(data))
+            except (TypeError, ValueError):
+                obj = None
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
 class PurchaseItemLocationSerializer(serializers.ModelSerializer):
+    # Writable so edits can match existing rows
+    id = serializers.IntegerField(required=False)
+    location = PreloadedPrimaryKeyRelatedField(queryset=Location.objects.all())
+
     class Meta:
         model = PurchaseItemLocation
         fields = ['id', 'location', 'quantity']
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    product = PreloadedPrimaryKeyRelatedField(queryset=Product.objects.all(), required=False, allow_null=True)
     item_locations = PurchaseItemLocationSerializer(many=True)
+    total_quantity = serializers.IntegerField(source='get_total_quantity', read_only=True)
+    total_price = serializers.DecimalField(max_digits=15, decimal_places=2, source='get_total_price', read_only=True)
 
     class Meta:
         model = PurchaseItem
@@ -134,6 +212,8 @@ class PurchaseItemSerializer(serializers.ModelSerializer):
             'product_variant',
             'serial_number',
             'item_locations',
+            'total_quantity',
+            'total_price',
         ]
         read_only_fields = [
             'product_name',
@@ -154,7 +234,7 @@ class PurchaseItemSerializer(serializers.ModelSerializer):
             seen_locations.add(location_id)
         return value
 
-class PurchaseSerializer(serializers.ModelSerializer):
+class PurchaseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = PurchaseItemSerializer(many=True)
 
     class Meta:
@@ -165,18 +245,39 @@ class PurchaseSerializer(serializers.ModelSerializer):
             'payment_mode', 'discount', 'total_amount', 'purchased_by', 'items'
         ]
         read_only_fields = ['total_amount']
+        expandable_fields = {'created_by': (serializers.StringRelatedField, {})}
 
     def to_internal_value(self, data):
         # Parse items JSON string before validation
         items = data.get('items')
         if isinstance(items, str):
             try:
-                data = data.copy()
+                # QueryDict.copy() deep-copies uploads, which fails for spooled invoice files
+                data = data.dict() if hasattr(data, 'dict') else dict(data)
                 data['items'] = json.loads(items)
             except json.JSONDecodeError:
                 raise serializers.ValidationError({'items': 'Invalid JSON format'})
+        self._preload_related(data.get('items'))
         return super().to_internal_value(data)
 
+    def _preload_related(self, items):
+        """Fetch every product and location the lines refer to with one query each."""
+        if not isinstance(items, list):
+            return
+        product_ids, location_ids = set(), set()
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            product_ids.add(item.get('product'))
+            for loc in item.get('item_locations') or []:
+                if isinstance(loc, dict):
+                    location_ids.add(loc.get('location'))
+        ids = lambda values: {int(v) for v in values if isinstance(v, (int, str)) and str(v).isdigit()}
+        self.context['preloaded'] = {
+            Product: Product.objects.in_bulk(ids(product_ids)),
+            Location: Location.objects.in_bulk(ids(location_ids)),
+        }
+
     @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
@@ -184,22 +285,8 @@ class PurchaseSerializer(serializers.ModelSerializer):
 
         purchase = Purchase.objects.create(created_by=request.user, **validated_data)
 
-        for item_data in items_data:
-            locs_data = item_data.pop('item_locations', [])
-
-            # Fetch product instance for backup
-            product = item_data.get('product')
-            if product:
-                item_data['product_name'] = product.item_name
-                item_data['product_barcode'] = product.unique_id
-                item_data['product_brand'] = product.brand or ''
-                item_data['product_variant'] = product.variants or ''
-                item_data['serial_number'] = product.serial_number or ''
-
-            item = PurchaseItem.objects.create(purchase=purchase, **item_data)
-
-            for loc_data in locs_data:
-                PurchaseItemLocation.objects.create(purchase_item=item, **loc_data)
+        added = purchases.create_items(purchase, items_data)
+        self._apply_stock(purchase, added)
 
         purchase.total_amount = purchase.calculate_total_amount()
         purchase.save(update_fields=["total_amount"])
@@ -210,26 +297,7 @@ class PurchaseSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items', None)
 
         if items_data is not None:
-            instance.items.all().delete()
-            for item_data in items_data:
-                locs_data = item_data.pop('item_locations', [])
-
-                product = item_data.get('product')
-                if product:
-                    item_data['product_name'] = product.item_name
-                    item_data['product_barcode'] = product.unique_id
-                    item_data['product_brand'] = product.brand or ''
-                    item_data['product_variant'] = product.variants or ''
-                    item_data['serial_number'] = product.serial_number or ''
-
-                item = PurchaseItem.objects.create(purchase=instance, **item_data)
-
-                for loc_data in locs_data:
-                    PurchaseItemLocation.objects.create(purchase_item=item, **loc_data)
-
-                if item.rate != item.product.rate:
-                    item.product.rate = item.rate
-                    item.product.save()
+            self._apply_stock(instance, purchases.sync_items(instance, items_data))
 
         # Update other fields
         for attr, value in validated_data.items():
@@ -238,7 +306,37 @@ class PurchaseSerializer(serializers.ModelSerializer):
         instance.total_amount = instance.calculate_total_amount()
         instance.save()
         return instance
+
+    def to_representation(self, instance):
+        # No-op for list pages, which are prefetched by the view
+        prefetch_related_objects([instance], 'items__item_locations')
+        return super().to_representation(instance)
+
+    def _apply_stock(self, purchase, deltas):
+        try:
+            purchases.apply_purchase_stock(purchase, deltas)
+        except stock.InsufficientStock as e:
+            raise serializers.ValidationError({'items': [
+                f"Stock of product {product_id} at location {location_id} would drop below zero "
+                f"(have {available}, change {delta})."
+                for product_id, location_id, available, delta in e.shortages
+            ]})
     
+class PurchaseListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Purchase history rows without line items; ?expand=items brings them back."""
+
+    class Meta:
+        model = Purchase
+        fields = [
+            'id', 'supplier_name', 'contact_number',
+            'invoice_number', 'invoice_image', 'purchase_date',
+            'payment_mode', 'discount', 'total_amount', 'purchased_by', 'created_at'
+        ]
+        expandable_fields = {
+            'created_by': (serializers.StringRelatedField, {}),
+            'items': (PurchaseItemSerializer, {'many': True}),
+        }
+
 class PurchaseItemLocationReadSerializer(serializers.ModelSerializer):
     location_name = serializers.CharField(source='location.name', read_only=True)
 
@@ -248,12 +346,14 @@ class PurchaseItemLocationReadSerializer(serializers.ModelSerializer):
 
 class PurchaseItemReadSerializer(serializers.ModelSerializer):
     item_locations = PurchaseItemLocationReadSerializer(many=True, read_only=True)
+    total_quantity = serializers.IntegerField(source='get_total_quantity', read_only=True)
+    total_price = serializers.DecimalField(max_digits=15, decimal_places=2, source='get_total_price', read_only=True)
 
     class Meta:
         model = PurchaseItem
         fields = [
             'id', 'product_name', 'product_barcode', 'product_brand', 'serial_number',
-            'product_variant', 'rate', 'item_locations'
+            'product_variant', 'rate', 'item_locations', 'total_quantity', 'total_price'
         ]
 
 class PurchaseDetailSerializer(serializers.ModelSerializer):
@@ -0,0 +1,164 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import analytics, images, stock, summary, sync, versions
+from .cache import invalidate_products, scan_cache
+from .models import Category, Location, Product, ProductLocation, Purchase
+
+def _invalidate_scans(unique_ids):
+    unique_ids = list(unique_ids)
+    transaction.on_commit(lambda: scan_cache.invalidate(unique_ids))
+
+# ----------------------------
+# Product
+# ----------------------------
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or not instance.pk:
+        return
+    instance._previous_state = Product.objects.filter(pk=instance.pk).values(
+        'unique_id', 'rate', 'category_id', 'active', 'image', 'image_thumbnail', 'image_medium'
+    ).first()
+
+@receiver(post_save, sender=Product)
+def update_summary_for_product(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_state', None)
+    summary.apply_product_change(instance, previous)
+    sync.record_changes([instance.pk])
+    _invalidate_scans([instance.unique_id, previous and previous['unique_id']])
+
+@receiver(post_save, sender=Product)
+def update_image_variants(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'image' not in update_fields):
+        return
+    previous = None if created else getattr(instance, '_previous_state', None)
+    if previous is not None and (previous['image'] or '') == (instance.image.name or ''):
+        return
+    if previous is not None:
+        images.delete_variant_files(
+            instance.image_thumbnail.storage, [previous['image_thumbnail'], previous['image_medium']]
+        )
+    if instance.image:
+        images.generate_variants(instance)
+    elif previous is not None:
+        images.delete_variants(instance)
+
+@receiver(pre_delete, sender=Product)
+def remove_product_from_summary(sender, instance, **kwargs):
+    summary.remove_product(instance)
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product(sender, instance, **kwargs):
+    sync.record_changes([instance.pk])
+    _invalidate_scans([instance.unique_id])
+
+@receiver(post_delete, sender=Product)
+def delete_image_variants(sender, instance, **kwargs):
+    names = [instance.image_thumbnail.name, instance.image_medium.name]
+    storage = instance.image_thumbnail.storage
+    transaction.on_commit(lambda: images.delete_variant_files(storage, names))
+
+# ----------------------------
+# Category / Location
+# ----------------------------
+
+@receiver(pre_delete, sender=Category)
+def move_category_summary(sender, instance, **kwargs):
+    summary.merge_category_into_uncategorized(instance)
+    # Products are detached with an UPDATE that sends no signals
+    sync.record_queryset(instance.products.all())
+    _invalidate_scans(instance.products.values_list('unique_id', flat=True))
+
+@receiver(post_save, sender=Category)
+def invalidate_category_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        sync.record_queryset(instance.products.all())
+        transaction.on_commit(lambda: invalidate_products(category=instance))
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def bump_reference_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(sender)
+
+@receiver(post_save, sender=Location)
+def invalidate_location_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        transaction.on_commit(lambda: invalidate_products(product_locations__location=instance))
+
+# ----------------------------
+# ProductLocation
+# ----------------------------
+
+@receiver(pre_save, sender=ProductLocation)
+def remember_stock_state(sender, instance, raw=False, **kwargs):
+    instance._previous_stock = None
+    if raw or not instance.pk:
+        return
+    instance._previous_stock = ProductLocation.objects.filter(pk=instance.pk).values_list(
+        'product_id', 'location_id', 'quantity'
+    ).first()
+
+@receiver(post_save, sender=ProductLocation)
+def update_summary_for_stock(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not isinstance(instance.quantity, int):
+        # Saved with an F() expression
+        instance.refresh_from_db(fields=['quantity'])
+
+    previous = getattr(instance, '_previous_stock', None)
+    current = (instance.product_id, instance.location_id, instance.quantity)
+    if previous is None:
+        changes = [(current[0], current[1], 0, current[2])]
+    elif previous[:2] == current[:2]:
+        changes = [(current[0], current[1], previous[2], current[2])]
+    else:
+        changes = [(previous[0], previous[1], previous[2], 0), (current[0], current[1], 0, current[2])]
+    stock.stock_changed(changes)
+    product_ids = {change[0] for change in changes}
+    transaction.on_commit(lambda: invalidate_products(product_ids))
+
+@receiver(pre_delete, sender=ProductLocation)
+def remove_stock_from_summary(sender, instance, **kwargs):
+    stock.stock_changed([(instance.product_id, instance.location_id, instance.quantity, 0)])
+
+@receiver(post_delete, sender=ProductLocation)
+def invalidate_removed_stock(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_products([product_id]))
+
+# ----------------------------
+# Purchase
+# ----------------------------
+
+SPEND_KEY_FIELDS = {'supplier_name', 'purchase_date'}
+
+@receiver(pre_save, sender=Purchase)
+def remember_spend_key(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_spend_key = None
+    if raw or not instance.pk or (update_fields is not None and not SPEND_KEY_FIELDS & set(update_fields)):
+        return
+    previous = Purchase.objects.filter(pk=instance.pk).values_list('supplier_name', 'purchase_date').first()
+    if previous:
+        instance._previous_spend_key = analytics.purchase_key(*previous)
+
+@receiver(post_save, sender=Purchase)
+def update_supplier_spend(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    analytics.refresh({
+        analytics.purchase_key(instance.supplier_name, instance.purchase_date),
+        getattr(instance, '_previous_spend_key', None),
+    } - {None})
+
+@receiver(post_delete, sender=Purchase)
+def remove_supplier_spend(sender, instance, **kwargs):
+    analytics.refresh({analytics.purchase_key(instance.supplier_name, instance.purchase_date)})
@@ -0,0 +1,210 @@
+import contextvars
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from . import summary, sync
+from .cache import invalidate_products
+from .models import ProductLocation, StockMovement, StockSnapshot
+
+_source = contextvars.ContextVar('stock_movement_source', default=(StockMovement.ADJUSTMENT, None))
+
+class InsufficientStock(Exception):
+    """
+    Applying the deltas would take stock below zero. `shortages` lists
+    (product_id, location_id, available, delta) for each offending pair.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f'{len(shortages)} stock rows would go negative')
+
+# ----------------------------
+# Recording changes
+# ----------------------------
+
+@contextmanager
+def movement_source(source_type, source_id=None):
+    """
+    Attribute the stock changes made inside the block to a document, e.g.
+
+        with movement_source(StockMovement.SALE, sale.pk):
+            ...
+    """
+    token = _source.set((source_type, source_id))
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+def record_movements(changes):
+    """Append one ledger row per (product_id, location_id, old_qty, new_qty) that moved."""
+    source_type, source_id = _source.get()
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=product_id, location_id=location_id, delta=new - old,
+            source_type=source_type, source_id=source_id, created_at=now,
+        )
+        for product_id, location_id, old, new in changes
+        if new != old
+    ])
+
+def stock_changed(changes):
+    """
+    Bookkeeping for ProductLocation quantity changes: inventory summary,
+    movement ledger and sync journal. The model signals call this; bulk
+    writers that skip signals must call it themselves.
+    """
+    if not changes:
+        return
+    summary.apply_stock_changes(changes)
+    record_movements(changes)
+    sync.record_changes({change[0] for change in changes})
+
+def _lock_rows(deltas):
+    product_ids = {product_id for product_id, _ in deltas}
+    location_ids = {location_id for _, location_id in deltas}
+    # Always lock in id order so concurrent batches cannot deadlock
+    rows = ProductLocation.objects.select_for_update().filter(
+        product_id__in=product_ids, location_id__in=location_ids
+    ).order_by('id')
+    return {(pl.product_id, pl.location_id): pl for pl in rows if (pl.product_id, pl.location_id) in deltas}
+
+@transaction.atomic
+def apply_deltas(deltas):
+    """
+    Add {(product_id, location_id): delta} to ProductLocation as one batch:
+    lock the rows, create missing ones, refuse anything that would go
+    negative, then write every quantity with a single F() bulk update.
+    Returns the (product_id, location_id, old_qty, new_qty) changes.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    if any(delta != int(delta) for delta in deltas.values()):
+        # ProductLocation.quantity and the ledger are whole units
+        raise ValueError('Stock deltas must be whole numbers.')
+    deltas = {key: int(delta) for key, delta in deltas.items()}
+
+    rows = _lock_rows(deltas)
+    missing = [key for key, delta in deltas.items() if key not in rows and delta > 0]
+    if missing:
+        # Rows created concurrently are left alone and picked up by the re-lock
+        ProductLocation.objects.bulk_create(
+            [ProductLocation(product_id=p, location_id=l, quantity=0) for p, l in missing],
+            ignore_conflicts=True,
+        )
+        rows = _lock_rows(deltas)
+
+    shortages = []
+    for (product_id, location_id), delta in deltas.items():
+        available = rows[product_id, location_id].quantity if (product_id, location_id) in rows else 0
+        if available + delta < 0:
+            shortages.append((product_id, location_id, available, delta))
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    changes = []
+    for key, pl in rows.items():
+        changes.append((key[0], key[1], pl.quantity, pl.quantity + deltas[key]))
+        pl.quantity = F('quantity') + deltas[key]
+    ProductLocation.objects.bulk_update(list(rows.values()), ['quantity'])
+
+    stock_changed(changes)
+    product_ids = {product_id for product_id, _ in deltas}
+    transaction.on_commit(lambda: invalidate_products(product_ids))
+    return changes
+
+# ----------------------------
+# Snapshots
+# ----------------------------
+
+def _latest_snapshots(snapshots):
+    """Narrow `snapshots` to the newest row of each (product, location)."""
+    newest = snapshots.filter(
+        product_id=OuterRef('product_id'), location_id=OuterRef('location_id')
+    ).order_by('-taken_at', '-id').values('pk')[:1]
+    return snapshots.filter(pk=Subquery(newest))
+
+# Longer than any transaction that writes stock. Ledger ids are allocated on
+# insert but become visible on commit, so a lower id can still appear after
+# a higher one has been read; movements older than this are all committed.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+@transaction.atomic
+def take_snapshot(chunk_size=1000, lag=SNAPSHOT_LAG):
+    """
+    Roll every pair that moved since the last run forward from its previous
+    snapshot, up to the newest movement older than `lag`. Returns the number
+    of snapshot rows written.
+    """
+    taken_at = timezone.now()
+    previous = StockSnapshot.objects.aggregate(last=Max('last_movement_id'))['last'] or 0
+    watermark = StockMovement.objects.filter(
+        created_at__lte=taken_at - lag
+    ).aggregate(last=Max('id'))['last'] or 0
+    if watermark <= previous:
+        return 0
+
+    deltas = {
+        (row['product_id'], row['location_id']): row['delta']
+        for row in StockMovement.objects.filter(id__gt=previous, id__lte=watermark)
+        .values('product_id', 'location_id').annotate(delta=Sum('delta'))
+    }
+
+    pairs = sorted(deltas)
+    written = 0
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        balances = {
+            (product_id, location_id): quantity
+            for product_id, location_id, quantity in _latest_snapshots(
+                StockSnapshot.objects.filter(product_id__in={p for p, _ in chunk})
+            ).values_list('product_id', 'location_id', 'quantity')
+        }
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(
+                product_id=product_id, location_id=location_id,
+                quantity=balances.get((product_id, location_id), 0) + deltas[product_id, location_id],
+                last_movement_id=watermark, taken_at=taken_at,
+            )
+            for product_id, location_id in chunk
+        ])
+        written += len(chunk)
+    return written
+
+# ----------------------------
+# Queries
+# ----------------------------
+
+def stock_at(product_id, at, location_id=None):
+    """
+    {location_id: quantity} for a product as of datetime `at`: the newest
+    snapshot of each location before `at` plus the movements logged after it.
+    """
+    snapshots = StockSnapshot.objects.filter(product_id=product_id, taken_at__lte=at)
+    if location_id is not None:
+        snapshots = snapshots.filter(location_id=location_id)
+
+    balances, watermarks = {}, {}
+    for loc, quantity, last_movement_id in _latest_snapshots(snapshots).values_list(
+        'location_id', 'quantity', 'last_movement_id'
+    ):
+        balances[loc] = quantity
+        watermarks[loc] = last_movement_id
+
+    # Locations without a snapshot before `at` only moved after the newest run
+    pending = ~Q(location_id__in=watermarks) & Q(id__gt=max(watermarks.values(), default=0))
+    for loc, last_movement_id in watermarks.items():
+        pending |= Q(location_id=loc, id__gt=last_movement_id)
+
+    movements = StockMovement.objects.filter(pending, product_id=product_id, created_at__lte=at)
+    if location_id is not None:
+        movements = movements.filter(location_id=location_id)
+    for loc, delta in movements.values('location_id').annotate(delta=Sum('delta')).values_list('location_id', 'delta'):
+        balances[loc] = balances.get(loc, 0) + delta
+    return balances
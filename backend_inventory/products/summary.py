@@ -0,0 +1,230 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import InventorySummary, Product, ProductLocation
+
+# ----------------------------
+# Incremental updates
+# ----------------------------
+
+def _new_delta():
+    # [active_products, total_units, stock_value]
+    return [0, 0, Decimal('0')]
+
+def _apply_deltas(deltas):
+    """
+    Add {(location_id, category_id): [active, units, value]} to the summary
+    rows with one F() update per touched row.
+    """
+    for (location_id, category_id), (active, units, value) in deltas.items():
+        if not (active or units or value):
+            continue
+        rows = InventorySummary.objects.filter(location_id=location_id, category_id=category_id)
+        change = dict(
+            active_products=F('active_products') + active,
+            total_units=F('total_units') + units,
+            stock_value=F('stock_value') + value,
+        )
+        if rows.update(**change):
+            continue
+        try:
+            # A concurrent write may create the same row first
+            with transaction.atomic():
+                InventorySummary.objects.create(
+                    location_id=location_id,
+                    category_id=category_id,
+                    active_products=active,
+                    total_units=units,
+                    stock_value=value,
+                )
+        except IntegrityError:
+            rows.update(**change)
+
+def apply_stock_changes(changes):
+    """
+    Record stock changes given as (product_id, location_id, old_qty, new_qty)
+    tuples. Bulk stock writers that bypass model signals call this directly.
+    """
+    changes = [c for c in changes if c[2] != c[3]]
+    if not changes:
+        return
+
+    products = {
+        p['id']: p for p in Product.objects.filter(
+            pk__in={c[0] for c in changes}
+        ).values('id', 'category_id', 'rate', 'active')
+    }
+
+    deltas = defaultdict(_new_delta)
+    for product_id, location_id, old_qty, new_qty in changes:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        delta = deltas[(location_id, product['category_id'])]
+        delta[1] += new_qty - old_qty
+        delta[2] += (new_qty - old_qty) * product['rate']
+        if product['active']:
+            delta[0] += int(new_qty > 0) - int(old_qty > 0)
+
+    _apply_deltas(deltas)
+
+def apply_product_change(product, previous):
+    """
+    Move a product's contribution after its rate, category or active flag
+    changed. `previous` holds the old `rate`, `category_id` and `active`.
+    """
+    apply_product_changes([(product, previous)])
+
+def apply_product_changes(changes):
+    """
+    apply_product_change for many (product, previous) pairs at once: one
+    query for all their stock rows and one F() update per touched summary row.
+    """
+    deltas = defaultdict(_new_delta)
+    moved = {}
+    for product, previous in changes:
+        if previous is None:
+            if product.active:
+                deltas[(None, product.category_id)][0] += 1
+            continue
+
+        rate = Decimal(str(product.rate))
+        if (
+            previous['rate'] == rate
+            and previous['category_id'] == product.category_id
+            and previous['active'] == product.active
+        ):
+            continue
+        deltas[(None, previous['category_id'])][0] -= int(previous['active'])
+        deltas[(None, product.category_id)][0] += int(product.active)
+        moved[product.pk] = (product, previous, rate)
+
+    if moved:
+        for product_id, location_id, quantity in ProductLocation.objects.filter(
+            product_id__in=moved
+        ).values_list('product_id', 'location_id', 'quantity'):
+            product, previous, rate = moved[product_id]
+            old = deltas[(location_id, previous['category_id'])]
+            old[0] -= int(previous['active'] and quantity > 0)
+            old[1] -= quantity
+            old[2] -= quantity * previous['rate']
+
+            new = deltas[(location_id, product.category_id)]
+            new[0] += int(product.active and quantity > 0)
+            new[1] += quantity
+            new[2] += quantity * rate
+
+    _apply_deltas(deltas)
+
+def add_products(products):
+    """Count newly bulk-created products in their categories' active totals."""
+    deltas = defaultdict(_new_delta)
+    for product in products:
+        if product.active:
+            deltas[(None, product.category_id)][0] += 1
+    _apply_deltas(deltas)
+
+def remove_product(product):
+    """Drop a deleted product from its category's active count."""
+    if product.active:
+        deltas = defaultdict(_new_delta)
+        deltas[(None, product.category_id)][0] -= 1
+        _apply_deltas(deltas)
+
+def merge_category_into_uncategorized(category):
+    """Products of a deleted category become uncategorized; move their totals."""
+    deltas = defaultdict(_new_delta)
+    for row in InventorySummary.objects.filter(category=category):
+        delta = deltas[(row.location_id, None)]
+        delta[0] += row.active_products
+        delta[1] += row.total_units
+        delta[2] += row.stock_value
+    _apply_deltas(deltas)
+
+# ----------------------------
+# Full rebuild
+# ----------------------------
+
+@transaction.atomic
+def rebuild_inventory_summary():
+    """Recompute every summary row from ProductLocation and Product."""
+    InventorySummary.objects.all().delete()
+
+    stock = ProductLocation.objects.values('location_id', 'product__category_id').annotate(
+        units=Coalesce(Sum('quantity'), 0),
+        value=Coalesce(
+            Sum(F('quantity') * F('product__rate'), output_field=DecimalField(max_digits=18, decimal_places=2)),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        ),
+        active=Count('id', filter=Q(product__active=True, quantity__gt=0)),
+    )
+    catalog = Product.objects.filter(active=True).values('category_id').annotate(active=Count('id'))
+
+    rows = [
+        InventorySummary(
+            location_id=row['location_id'],
+            category_id=row['product__category_id'],
+            active_products=row['active'],
+            total_units=row['units'],
+            stock_value=row['value'],
+        )
+        for row in stock
+    ]
+    rows += [
+        InventorySummary(category_id=row['category_id'], active_products=row['active'])
+        for row in catalog
+    ]
+    InventorySummary.objects.bulk_create(rows)
+    return len(rows)
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def get_inventory_summary():
+    """Overall, per-location and per-category totals read from the summary rows."""
+    # Running rows that fell back to zero are kept; a rebuild would not have them
+    rows = InventorySummary.objects.exclude(
+        active_products=0, total_units=0, stock_value=0
+    ).values(
+        'location_id', 'location__name', 'category_id', 'category__name',
+        'active_products', 'total_units', 'stock_value',
+    )
+
+    overall = {'active_products': 0, 'total_units': 0, 'stock_value': Decimal('0')}
+    by_location = {}
+    by_category = {}
+
+    for row in rows:
+        category = by_category.setdefault(row['category_id'], {
+            'category': row['category_id'],
+            'category_name': row['category__name'] or 'Uncategorized',
+            'active_products': 0, 'total_units': 0, 'stock_value': Decimal('0'),
+        })
+
+        if row['location_id'] is None:
+            # Catalog-wide active count for the category
+            overall['active_products'] += row['active_products']
+            category['active_products'] += row['active_products']
+            continue
+
+        location = by_location.setdefault(row['location_id'], {
+            'location': row['location_id'],
+            'location_name': row['location__name'],
+            'active_products': 0, 'total_units': 0, 'stock_value': Decimal('0'),
+        })
+        location['active_products'] += row['active_products']
+        for target in (overall, location, category):
+            target['total_units'] += row['total_units']
+            target['stock_value'] += row['stock_value']
+
+    return {
+        **overall,
+        'by_location': sorted(by_location.values(), key=lambda r: r['location_name']),
+        'by_category': sorted(by_category.values(), key=lambda r: r['category_name']),
+    }
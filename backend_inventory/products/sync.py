@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CatalogChange, Product, ProductLocation
+
+SYNC_BATCH_SIZE = 1000
+MAX_SYNC_BATCH_SIZE = 5000
+
+# Longer than any transaction that journals changes. Journal ids are allocated
+# on insert but become visible on commit, so an entry can appear below a token
+# already handed out; entries older than this are all committed.
+SYNC_LAG = timedelta(minutes=5)
+
+PRODUCT_FIELDS = [
+    'id', 'unique_id', 'item_name', 'brand', 'serial_number', 'variants',
+    'category_id', 'category__name', 'rate', 'active', 'image_thumbnail',
+]
+
+# ----------------------------
+# Recording
+# ----------------------------
+
+def record_changes(product_ids):
+    """
+    Journal the given products as changed. Call this from any write path that
+    skips model signals (bulk_create, bulk_update, QuerySet.update) and
+    touches a product, its stock or its section prices.
+    """
+    product_ids = sorted({pid for pid in product_ids if pid})
+    if product_ids:
+        CatalogChange.objects.bulk_create([CatalogChange(product_id=pid) for pid in product_ids])
+
+def record_queryset(queryset):
+    """Journal every product in `queryset`, e.g. all products of a renamed category."""
+    record_changes(queryset.values_list('id', flat=True))
+
+def compact_changes(lag=SYNC_LAG):
+    """
+    Keep only the newest journal entry per product; returns rows deleted.
+    Recent entries are left alone so their ids never look like pending gaps.
+    """
+    latest = CatalogChange.objects.values('product_id').annotate(last=Max('id')).values('last')
+    deleted, _ = CatalogChange.objects.filter(
+        id__lte=settled_id(lag)
+    ).exclude(id__in=latest).delete()
+    return deleted
+
+def settled_id(lag=SYNC_LAG):
+    """
+    Highest journal id at or below which every entry is committed (or never
+    will be): any entry with a lower id was inserted before one older than `lag`.
+    """
+    horizon = timezone.now() - lag
+    return CatalogChange.objects.filter(
+        changed_at__lt=horizon
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def product_records(product_ids):
+    """Full sync records (product fields, stock and section prices) for `product_ids`."""
+    from sales.models import SectionProductPrice
+
+    records = {}
+    for values in Product.objects.filter(id__in=product_ids).values(*PRODUCT_FIELDS):
+        values['category'] = values.pop('category__name')
+        values['rate'] = str(values['rate'])
+        values['stock'] = []
+        values['prices'] = []
+        records[values['id']] = values
+
+    for product_id, location_id, quantity in ProductLocation.objects.filter(
+        product_id__in=records
+    ).values_list('product_id', 'location_id', 'quantity'):
+        records[product_id]['stock'].append({'location': location_id, 'quantity': quantity})
+
+    for product_id, section_id, price in SectionProductPrice.objects.filter(
+        product_id__in=records
+    ).values_list('product_id', 'section_id', 'price'):
+        records[product_id]['prices'].append({'section': section_id, 'price': str(price)})
+
+    return records
+
+def parse_token(token):
+    """
+    Split a sync token into (since, gaps). Tokens are "<id>" or
+    "<id>:<gap>,<gap>..." where the gaps are ids below `since` that were not
+    visible yet and are read again next time. Raises ValueError.
+    """
+    since, _, gaps = str(token).partition(':')
+    since = int(since)
+    gaps = sorted({int(gap) for gap in gaps.split(',')}) if gaps else []
+    if since < 0 or any(gap < 1 or gap >= since for gap in gaps):
+        raise ValueError(token)
+    return since, gaps
+
+def get_changes(since='0', limit=SYNC_BATCH_SIZE, lag=SYNC_LAG):
+    """
+    Products changed after token `since`, oldest first, at most `limit`
+    journal entries per call. Each changed product is sent whole, with its
+    stock and prices; ids that no longer exist come back in `deleted`.
+    Call again with the returned token while `has_more` is true.
+
+    Ids skipped over while their transaction may still be open are carried
+    in the token and picked up once they commit, until `lag` has passed.
+    """
+    since, gaps = parse_token(since)
+    floor = settled_id(lag)
+    entries = list(
+        CatalogChange.objects.filter(id__gt=since).order_by('id').values_list('id', 'product_id')[:limit]
+    )
+    filled = list(CatalogChange.objects.filter(id__in=gaps).values_list('id', 'product_id')) if gaps else []
+
+    last = entries[-1][0] if entries else since
+    seen = {entry_id for entry_id, _ in entries + filled}
+    pending = [
+        gap for gap in sorted(set(gaps) | set(range(max(since, floor) + 1, last)))
+        if gap > floor and gap not in seen
+    ]
+
+    changed = {product_id for _, product_id in entries + filled}
+    records = product_records(changed)
+    token = str(last)
+    if pending:
+        token += ':' + ','.join(map(str, pending))
+    return {
+        'token': token,
+        'has_more': len(entries) == limit,
+        'products': [records[pid] for pid in sorted(records)],
+        'deleted': sorted(changed - records.keys()),
+    }
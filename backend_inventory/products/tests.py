@@ -1,3 +1,810 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import analytics, stock
+from .cache import scan_cache
+from .importer import ImportFormatError, ProductImporter, iter_csv_rows
+from .models import (
+    CatalogChange, Category, InventorySummary, Location, Product, ProductLocation, Purchase, StockMovement, StockSnapshot,
+    SupplierSpend,
+)
+from .summary import get_inventory_summary, rebuild_inventory_summary
+
+
+class StockTestCase(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+        category = Category.objects.create(name='General')
+        self.main = Location.objects.create(name='Main Store')
+        self.shop = Location.objects.create(name='Shop')
+        self.pen = Product.objects.create(unique_id='PEN00001', item_name='Pen', rate=10, category=category)
+        self.ink = Product.objects.create(unique_id='INK00001', item_name='Ink', rate=20, category=category)
+
+    def quantity(self, product, location):
+        row = ProductLocation.objects.filter(product=product, location=location).first()
+        return row.quantity if row else None
+
+    def ledger(self, product, location):
+        return sum(StockMovement.objects.filter(product=product, location=location).values_list('delta', flat=True))
+
+    def assertStockConsistent(self):
+        # Ledger and running summary both agree with the stock rows
+        for row in ProductLocation.objects.all():
+            self.assertEqual(self.ledger(row.product_id, row.location_id), row.quantity)
+        before = get_inventory_summary()
+        rebuild_inventory_summary()
+        self.assertEqual(before, get_inventory_summary())
+
+
+# ----------------------------
+# apply_deltas
+# ----------------------------
+
+class ApplyDeltasTests(StockTestCase):
+    def test_creates_missing_rows_for_additions(self):
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 4, (self.ink.pk, self.shop.pk): 2})
+
+        self.assertEqual(self.quantity(self.pen, self.main), 4)
+        self.assertEqual(self.quantity(self.ink, self.shop), 2)
+        self.assertStockConsistent()
+
+    def test_adds_to_existing_rows(self):
+        ProductLocation.objects.create(product=self.pen, location=self.main, quantity=3)
+        stock.apply_deltas({(self.pen.pk, self.main.pk): -2})
+        self.assertEqual(self.quantity(self.pen, self.main), 1)
+
+    def test_shortage_writes_nothing(self):
+        ProductLocation.objects.create(product=self.pen, location=self.main, quantity=1)
+
+        with self.assertRaises(stock.InsufficientStock) as raised:
+            stock.apply_deltas({(self.pen.pk, self.main.pk): -2, (self.ink.pk, self.main.pk): 5})
+
+        self.assertEqual(raised.exception.shortages, [(self.pen.pk, self.main.pk, 1, -2)])
+        self.assertEqual(self.quantity(self.pen, self.main), 1)
+        self.assertIsNone(self.quantity(self.ink, self.main))
+
+    def test_fractional_deltas_are_refused(self):
+        ProductLocation.objects.create(product=self.pen, location=self.main, quantity=8)
+        with self.assertRaises(ValueError):
+            stock.apply_deltas({(self.pen.pk, self.main.pk): Decimal('-1.5')})
+        self.assertEqual(self.quantity(self.pen, self.main), 8)
+        self.assertStockConsistent()
+
+    def test_missing_row_cannot_go_negative(self):
+        with self.assertRaises(stock.InsufficientStock):
+            stock.apply_deltas({(self.pen.pk, self.shop.pk): -1})
+        self.assertIsNone(self.quantity(self.pen, self.shop))
+
+
+# ----------------------------
+# Product stock edits
+# ----------------------------
+
+class ProductLocationEditTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.back = Location.objects.create(name='Back room')
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 5, (self.pen.pk, self.shop.pk): 2})
+
+    def edit_locations(self, locations):
+        return self.client.patch(f'/api/products/products/{self.pen.pk}/', {
+            'locations': [{'location_id': location.pk, 'quantity': quantity} for location, quantity in locations],
+        }, format='json')
+
+    def row_ids(self):
+        return dict(ProductLocation.objects.filter(product=self.pen).values_list('location_id', 'id'))
+
+    def test_only_changed_rows_are_written(self):
+        before = self.row_ids()
+
+        response = self.edit_locations([(self.main, 5), (self.shop, 4), (self.back, 1)])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['total_quantity'], 10)
+        after = self.row_ids()
+        self.assertEqual(after[self.main.pk], before[self.main.pk])
+        self.assertEqual(after[self.shop.pk], before[self.shop.pk])
+        self.assertEqual((self.quantity(self.pen, self.shop), self.quantity(self.pen, self.back)), (4, 1))
+        # Only the two changes reach the ledger
+        self.assertEqual(StockMovement.objects.filter(product=self.pen).count(), 4)
+        self.assertStockConsistent()
+
+    def test_left_out_locations_are_removed(self):
+        response = self.edit_locations([(self.shop, 2)])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(list(self.row_ids()), [self.shop.pk])
+        self.assertEqual(self.ledger(self.pen, self.main), 0)
+        self.assertStockConsistent()
+
+    def test_bad_quantities_change_nothing(self):
+        before = self.row_ids()
+
+        for locations in ([(self.main, -1)], [(self.main, 'lots')]):
+            response = self.edit_locations(locations)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('locations', response.data)
+
+        self.assertEqual(self.row_ids(), before)
+        self.assertEqual(self.quantity(self.pen, self.main), 5)
+        self.assertStockConsistent()
+
+
+# ----------------------------
+# Scan cache
+# ----------------------------
+
+class ScanCacheTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        scan_cache.local.clear()
+        self.addCleanup(scan_cache.local.clear)
+
+    def scan(self, barcode='PEN00001'):
+        response = self.client.get('/api/products/scan/', {'barcode': barcode})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_repeat_scans_are_served_from_the_cache(self):
+        first = self.scan()
+        with self.assertNumQueries(0):
+            second = self.scan()
+
+        self.assertEqual(first, second)
+        self.assertTrue(second['found'])
+        self.assertEqual(second['product']['item_name'], 'Pen')
+        self.assertFalse(self.scan('NOPE0000')['found'])
+
+    def test_writes_drop_the_cached_payload(self):
+        self.scan()
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.apply_deltas({(self.pen.pk, self.main.pk): 3})
+        self.assertEqual(self.scan()['product']['total_quantity'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/products/products/{self.pen.pk}/', {'item_name': 'Blue pen'}, format='json')
+        self.assertEqual(self.scan()['product']['item_name'], 'Blue pen')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.main.name = 'Back room'
+            self.main.save()
+        self.assertEqual(self.scan()['product']['locations'][0]['location']['name'], 'Back room')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pen.delete()
+        self.assertFalse(self.scan()['found'])
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+
+class SparseFieldsetTests(StockTestCase):
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_fields_narrow_product_rows(self):
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 3})
+
+        # Two lookups for the ETag, then the products without joins or annotations
+        with self.assertNumQueries(3):
+            rows = self.get('/api/products/products/', fields='id,item_name,rate')
+
+        self.assertEqual([set(row) for row in rows], [{'id', 'item_name', 'rate'}] * 2)
+        full = self.get('/api/products/products/')
+        self.assertEqual(
+            {row['item_name']: row['total_quantity'] for row in full}, {'Pen': 3, 'Ink': 0}
+        )
+        self.assertIn('locations', full[0])
+
+    def test_expand_nests_the_category(self):
+        rows = self.get('/api/products/products/', fields='id,total_quantity', expand='category')
+
+        self.assertEqual(set(rows[0]), {'id', 'total_quantity', 'category'})
+        self.assertEqual(rows[0]['category']['name'], 'General')
+        self.assertIsInstance(self.get(f'/api/products/products/{self.pen.pk}/')['category'], str)
+
+    def test_purchase_rows_expand_to_their_lines(self):
+        self.client.post('/api/products/purchases/', {
+            'supplier_name': 'Acme', 'purchase_date': '2026-01-01', 'items': [
+                {'product': self.pen.pk, 'rate': '10', 'item_locations': [{'location': self.main.pk, 'quantity': 2}]},
+            ],
+        }, format='json')
+
+        row = self.get('/api/products/purchases/')[0]
+        self.assertNotIn('items', row)
+        row = self.get('/api/products/purchases/', fields='id,total_amount', expand='items,created_by')[0]
+        self.assertEqual(set(row), {'id', 'total_amount', 'items', 'created_by'})
+        self.assertEqual(row['items'][0]['total_quantity'], 2)
+        self.assertEqual(row['created_by'], 'admin (staff)')
+
+
+# ----------------------------
+# Conditional GET
+# ----------------------------
+
+class ConditionalListTests(StockTestCase):
+    def etag(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag, **params):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_lists_answer_304_from_the_counters(self):
+        etag = self.etag('/api/products/categories/')
+        with self.assertNumQueries(1):
+            self.assertNotModified('/api/products/categories/', etag)
+
+        self.client.post('/api/products/categories/', {'name': 'Stationery'}, format='json')
+        response = self.client.get('/api/products/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row['name'] for row in response.data), ['General', 'Stationery'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_product_etag_follows_stock_and_reference_data(self):
+        url = '/api/products/products/'
+        etag = self.etag(url)
+        self.assertNotModified(url, etag)
+        self.assertNotEqual(self.etag(url, fields='id'), etag)
+
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 1})
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        self.main.name = 'Back room'
+        self.main.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+
+# ----------------------------
+# Snapshots
+# ----------------------------
+
+class StockSnapshotTests(StockTestCase):
+    def age_movements(self, minutes):
+        StockMovement.objects.update(created_at=timezone.now() - timedelta(minutes=minutes))
+
+    def test_snapshots_only_cover_settled_movements(self):
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 5})
+        self.age_movements(10)
+        # Recent enough that a lower ledger id could still be uncommitted elsewhere
+        stock.apply_deltas({(self.pen.pk, self.main.pk): -2})
+
+        self.assertEqual(stock.take_snapshot(), 1)
+        snapshot = StockSnapshot.objects.get()
+        self.assertEqual(snapshot.quantity, 5)
+        self.assertEqual(stock.stock_at(self.pen.pk, timezone.now()), {self.main.pk: 3})
+
+        self.age_movements(10)
+        self.assertEqual(stock.take_snapshot(), 1)
+        self.assertEqual(StockSnapshot.objects.latest('id').quantity, 3)
+        self.assertEqual(stock.stock_at(self.pen.pk, timezone.now()), {self.main.pk: 3})
+        self.assertEqual(stock.take_snapshot(), 0)
+
+
+# ----------------------------
+# Purchases
+# ----------------------------
+
+class PurchaseStockTests(StockTestCase):
+    def line(self, product, rate, *locations):
+        return {
+            'product': product.pk,
+            'rate': str(rate),
+            'item_locations': [{'location': location.pk, 'quantity': quantity} for location, quantity in locations],
+        }
+
+    def create_purchase(self, items):
+        response = self.client.post('/api/products/purchases/', {
+            'supplier_name': 'Acme', 'purchase_date': '2026-01-01', 'items': items,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_create_adds_stock_per_location(self):
+        purchase = self.create_purchase([
+            self.line(self.pen, 12, (self.main, 5), (self.shop, 2)),
+            self.line(self.ink, 20, (self.main, 3)),
+        ])
+
+        self.assertEqual(self.quantity(self.pen, self.main), 5)
+        self.assertEqual(self.quantity(self.pen, self.shop), 2)
+        self.assertEqual(self.quantity(self.ink, self.main), 3)
+        self.assertEqual(str(purchase['total_amount']), '144.00')
+        self.assertEqual(
+            StockMovement.objects.filter(source_type=StockMovement.PURCHASE, source_id=purchase['id']).count(), 3
+        )
+        self.assertStockConsistent()
+
+    def test_create_takes_latest_purchase_rate(self):
+        self.create_purchase([self.line(self.pen, 12, (self.main, 1)), self.line(self.ink, 20, (self.main, 1))])
+
+        self.pen.refresh_from_db()
+        self.ink.refresh_from_db()
+        self.assertEqual(str(self.pen.rate), '12.00')
+        self.assertEqual(str(self.ink.rate), '20.00')
+        self.assertStockConsistent()
+
+    def edit_purchase(self, purchase_id, items):
+        return self.client.patch(f'/api/products/purchases/{purchase_id}/', {'items': items}, format='json')
+
+    def test_edit_applies_net_difference(self):
+        purchase = self.create_purchase([
+            self.line(self.pen, 10, (self.main, 5)),
+            self.line(self.ink, 20, (self.main, 3)),
+        ])
+        pen_line = purchase['items'][0]
+
+        # Pen moves from Main Store to Shop with one more unit; the ink line is dropped
+        response = self.edit_purchase(purchase['id'], [
+            {'id': pen_line['id'], **self.line(self.pen, 10, (self.shop, 6))},
+        ])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.quantity(self.pen, self.main), 0)
+        self.assertEqual(self.quantity(self.pen, self.shop), 6)
+        self.assertEqual(self.quantity(self.ink, self.main), 0)
+        self.assertEqual([item['id'] for item in response.data['items']], [pen_line['id']])
+        self.assertEqual(str(response.data['total_amount']), '60.00')
+        self.assertStockConsistent()
+
+    def test_edit_matches_lines_without_ids_by_product(self):
+        purchase = self.create_purchase([self.line(self.pen, 10, (self.main, 5))])
+
+        response = self.edit_purchase(purchase['id'], [self.line(self.pen, 10, (self.main, 2))])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['items'][0]['id'], purchase['items'][0]['id'])
+        self.assertEqual(self.quantity(self.pen, self.main), 2)
+        self.assertStockConsistent()
+
+    def test_edit_that_would_go_negative_changes_nothing(self):
+        purchase = self.create_purchase([
+            self.line(self.pen, 10, (self.main, 5)),
+            self.line(self.ink, 20, (self.main, 3)),
+        ])
+        # Most of the pens have been sold since
+        stock.apply_deltas({(self.pen.pk, self.main.pk): -4})
+
+        response = self.edit_purchase(purchase['id'], [self.line(self.ink, 20, (self.main, 3))])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertEqual(self.quantity(self.pen, self.main), 1)
+        self.assertEqual(self.quantity(self.ink, self.main), 3)
+        self.assertEqual(Purchase.objects.get(pk=purchase['id']).items.count(), 2)
+        self.assertEqual(str(Purchase.objects.get(pk=purchase['id']).total_amount), '110.00')
+        self.assertStockConsistent()
+
+    def test_admin_edit_that_would_go_negative_is_refused(self):
+        purchase = self.create_purchase([self.line(self.pen, 10, (self.main, 5))])
+        stock.apply_deltas({(self.pen.pk, self.main.pk): -4})
+        item = purchase['items'][0]
+        item_location = item['item_locations'][0]
+
+        admin_client = Client()
+        admin_client.force_login(get_user_model().objects.get(username='admin'))
+        url = f"/admin/products/purchase/{purchase['id']}/change/"
+        response = admin_client.post(url, {
+            'supplier_name': 'Acme', 'purchase_date': '2026-01-01', 'discount': '0',
+            'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 1,
+            'items-0-id': item['id'], 'items-0-purchase': purchase['id'],
+            'items-0-product': self.pen.pk, 'items-0-rate': '10', 'items-0-DELETE': 'on',
+            'items-0-item_locations-TOTAL_FORMS': 1, 'items-0-item_locations-INITIAL_FORMS': 1,
+            'items-0-item_locations-0-id': item_location['id'],
+            'items-0-item_locations-0-purchase_item': item['id'],
+            'items-0-item_locations-0-location': self.main.pk,
+            'items-0-item_locations-0-quantity': 5,
+        })
+
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertIn('would drop below zero', str(list(get_messages(response.wsgi_request))[0]))
+        self.assertEqual(Purchase.objects.get(pk=purchase['id']).items.count(), 1)
+        self.assertEqual(self.quantity(self.pen, self.main), 1)
+        self.assertStockConsistent()
+
+
+# ----------------------------
+# Inventory summary
+# ----------------------------
+
+class InventorySummaryTests(StockTestCase):
+    def summary_rows(self):
+        rows = InventorySummary.objects.values_list(
+            'location_id', 'category_id', 'active_products', 'total_units', 'stock_value'
+        )
+        # Keys are nullable; zero rows may linger incrementally but are not rebuilt
+        return sorted((row for row in rows if any(row[2:])), key=lambda row: (row[0] or 0, row[1] or 0))
+
+    def assertMatchesRebuild(self):
+        incremental = self.summary_rows()
+        rebuild_inventory_summary()
+        self.assertEqual(incremental, self.summary_rows())
+
+    def test_summary_follows_purchases_sales_and_imports(self):
+        from sales.models import SalesChannel, SalesSection
+
+        response = self.client.post('/api/products/purchases/', {
+            'supplier_name': 'Acme', 'purchase_date': '2026-01-01', 'items': [
+                {'product': self.pen.pk, 'rate': '12', 'item_locations': [
+                    {'location': self.main.pk, 'quantity': 5}, {'location': self.shop.pk, 'quantity': 3},
+                ]},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertMatchesRebuild()
+
+        section = SalesSection.objects.create(
+            channel=SalesChannel.objects.create(name='Offline'), name='Counter', location=self.shop
+        )
+        response = self.client.post('/api/sales/sales/', {
+            'channel': section.channel_id, 'section': section.pk, 'payment_mode': 'Cash',
+            'discount': '0', 'total_amount': '24',
+            'items_write': [{'product': self.pen.pk, 'product_name': 'Pen', 'price': '12', 'quantity': '2', 'total': '24'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertMatchesRebuild()
+
+        response = self.client.post('/api/products/products/import/', {'file': SimpleUploadedFile(
+            'products.csv', b'item_name,rate,category,qty:Shop\nPad,4,General,10\nOld pad,4,General,0\n'
+        )}, format='multipart')
+        self.assertEqual(response.data['created'], 2, response.data)
+        self.assertMatchesRebuild()
+
+        response = self.client.get('/api/products/summary/')
+
+        self.assertEqual(response.status_code, 200)
+        # Pen at the purchase rate of 12: 5 in Main Store, 1 in Shop; 10 pads at 4
+        self.assertEqual(response.data['total_units'], 16)
+        self.assertEqual(response.data['stock_value'], '112.00')
+        self.assertEqual(response.data['active_products'], 4)
+        self.assertEqual(
+            [(row['location_name'], row['total_units'], row['stock_value']) for row in response.data['by_location']],
+            [('Main Store', 5, '60.00'), ('Shop', 11, '52.00')],
+        )
+        self.assertEqual(
+            [(row['category_name'], row['active_products']) for row in response.data['by_category']],
+            [('General', 4)],
+        )
+
+    def test_summary_follows_catalog_edits(self):
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 4, (self.ink.pk, self.shop.pk): 2})
+        other = Category.objects.create(name='Other')
+
+        response = self.client.patch(f'/api/products/products/{self.ink.pk}/', {'rate': '25', 'category': other.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertMatchesRebuild()
+
+        response = self.client.patch(f'/api/products/products/{self.pen.pk}/', {'active': False}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertMatchesRebuild()
+
+        self.client.delete(f'/api/products/products/{self.ink.pk}/')
+        self.assertMatchesRebuild()
+        self.assertEqual(get_inventory_summary()['stock_value'], Decimal('40'))
+
+    def test_emptied_locations_drop_out_of_the_totals(self):
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 4, (self.pen.pk, self.shop.pk): 1})
+        ProductLocation.objects.get(product=self.pen, location=self.main).delete()
+
+        incremental = get_inventory_summary()
+        rebuild_inventory_summary()
+        self.assertEqual(incremental, get_inventory_summary())
+        self.assertEqual([row['location_name'] for row in incremental['by_location']], ['Shop'])
+
+
+# ----------------------------
+# Supplier spend
+# ----------------------------
+
+class SupplierSpendTests(StockTestCase):
+    def purchase(self, supplier, day, quantity, rate=10, discount=0, purchased_by=None):
+        response = self.client.post('/api/products/purchases/', {
+            'supplier_name': supplier, 'purchase_date': day, 'discount': str(discount), 'purchased_by': purchased_by,
+            'items': [{'product': self.pen.pk, 'rate': str(rate), 'item_locations': [
+                {'location': self.main.pk, 'quantity': quantity},
+            ]}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def rollups(self):
+        return sorted(SupplierSpend.objects.values_list(
+            'supplier_name', 'purchased_by', 'month', 'spend', 'discount', 'units', 'invoices'
+        ))
+
+    def assertMatchesRebuild(self):
+        # The command's worker threads cannot see a test transaction, so rebuild inline
+        incremental = self.rollups()
+        SupplierSpend.objects.all().delete()
+        for month in analytics.purchase_months():
+            analytics.store_month(month, analytics.compute_month(month))
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollups_follow_purchase_edits(self):
+        first = self.purchase('Acme', '2026-01-10', 5, discount=5)
+        self.purchase('Acme', '2026-01-20', 2, purchased_by='MAIN_STORE')
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            SupplierSpend.objects.get(supplier_name='Acme', purchased_by='').spend, Decimal('45')
+        )
+
+        # Moved to another supplier and month, then deleted
+        response = self.client.patch(f"/api/products/purchases/{first['id']}/", {
+            'supplier_name': 'Bolt', 'purchase_date': '2026-02-03',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertMatchesRebuild()
+        self.assertFalse(SupplierSpend.objects.filter(supplier_name='Acme', purchased_by='').exists())
+
+        self.client.delete(f"/api/products/purchases/{first['id']}/")
+        self.assertMatchesRebuild()
+        self.assertEqual([row[0] for row in self.rollups()], ['Acme'])
+
+    def test_analytics_mix_rollups_and_partial_months(self):
+        self.purchase('Acme', '2026-01-10', 1)
+        self.purchase('Acme', '2026-01-20', 2)
+        self.purchase('Acme', '2026-02-15', 3)
+        self.purchase('Bolt', '2026-03-05', 4, discount=4)
+        self.purchase('Bolt', '2026-03-25', 50)
+
+        response = self.client.get('/api/products/purchases/analytics/', {
+            'date_from': '2026-01-15', 'date_to': '2026-03-10', 'group_by': 'supplier_name,month',
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        rows = [(row['supplier_name'], str(row['month']), row['spend'], row['units'], row['invoices'])
+                for row in response.data['rows']]
+        self.assertEqual(rows, [
+            ('Acme', '2026-01-01', Decimal('20'), 2, 1),
+            ('Acme', '2026-02-01', Decimal('30'), 3, 1),
+            ('Bolt', '2026-03-01', Decimal('36'), 4, 1),
+        ])
+        self.assertEqual(response.data['totals']['spend'], Decimal('86'))
+        self.assertEqual(response.data['totals']['discount'], Decimal('4'))
+
+        response = self.client.get('/api/products/purchases/analytics/', {'group_by': 'colour'})
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Import
+# ----------------------------
+
+class ProductImportTests(StockTestCase):
+    def upload(self, name, content):
+        return self.client.post('/api/products/products/import/', {
+            'file': SimpleUploadedFile(name, content),
+        }, format='multipart')
+
+    def test_non_utf8_csv_is_refused_before_writing(self):
+        rows = '\n'.join(f'Caf\xe9 {i},1,General' for i in range(3))
+        response = self.upload('products.csv', f'item_name,rate,category\n{rows}\n'.encode('latin-1'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.data['error'])
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_corrupt_xlsx_is_a_format_error(self):
+        response = self.upload('products.xlsx', b'PK\x03\x04 not really a workbook')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('XLSX', response.data['error'])
+
+    def test_unreadable_tail_reports_committed_rows(self):
+        # A record longer than the csv module allows makes the third row unreadable
+        self.addCleanup(csv.field_size_limit, csv.field_size_limit(100))
+        content = b'item_name,rate,category\nA,1,General\nB,1,General\n"' + b'x' * 500 + b',1,General\n'
+
+        with self.assertRaises(ImportFormatError) as raised:
+            ProductImporter(chunk_size=1).run(iter_csv_rows(io.BytesIO(content)))
+
+        self.assertEqual(raised.exception.report['created'], 2)
+        self.assertEqual(raised.exception.report['last_row'], 3)
+        self.assertTrue(Product.objects.filter(item_name='B').exists())
+
+    def test_invalid_values_are_row_errors(self):
+        content = (
+            'item_name,rate,category,qty:Main Store\n'
+            'Inf,Infinity,General,1\n'
+            'Big,123456789012.50,General,1\n'
+            'Half,5,General,2.7\n'
+            'Good,5,General,2\n'
+        ).encode()
+        response = self.upload('products.csv', content)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(self.quantity(Product.objects.get(item_name='Good'), self.main), 2)
+        self.assertStockConsistent()
+
+
+# ----------------------------
+# Export
+# ----------------------------
+
+class ProductExportTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        from sales.models import SalesChannel, SalesSection, SectionProductPrice
+
+        stock.apply_deltas({(self.pen.pk, self.main.pk): 5, (self.pen.pk, self.shop.pk): 2})
+        section = SalesSection.objects.create(
+            channel=SalesChannel.objects.create(name='Offline'), name='Counter', location=self.shop
+        )
+        SectionProductPrice.objects.create(section=section, product=self.pen, price='12.50')
+
+    def export(self, fmt):
+        response = self.client.get('/api/products/products/export/', {'type': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_stock_and_price_columns(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode())))
+
+        self.assertEqual([row['unique_id'] for row in rows], ['PEN00001', 'INK00001'])
+        self.assertEqual(rows[0]['qty:Main Store'], '5')
+        self.assertEqual(rows[0]['qty:Shop'], '2')
+        self.assertEqual(rows[0]['price:Offline/Counter'], '12.50')
+        self.assertEqual((rows[1]['qty:Main Store'], rows[1]['price:Offline/Counter']), ('', ''))
+        self.assertEqual(rows[0]['category'], 'General')
+
+    def test_ndjson_nests_stock_and_prices(self):
+        records = [json.loads(line) for line in self.export('ndjson').decode().splitlines()]
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['unique_id'], 'PEN00001')
+        self.assertEqual(records[0]['rate'], '10.00')
+        self.assertEqual(records[0]['stock'], {'Main Store': 5, 'Shop': 2})
+        self.assertEqual(records[0]['prices'], {'Offline/Counter': '12.50'})
+        self.assertEqual((records[1]['stock'], records[1]['prices']), ({}, {}))
+
+    def test_xlsx_has_the_csv_columns(self):
+        from openpyxl import load_workbook
+
+        sheet = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)['Products']
+        header, *rows = sheet.iter_rows(values_only=True)
+        rows = [dict(zip(header, row)) for row in rows]
+
+        self.assertEqual(list(header), next(csv.reader(io.StringIO(self.export('csv').decode()))))
+        self.assertEqual([row['unique_id'] for row in rows], ['PEN00001', 'INK00001'])
+        self.assertEqual((rows[0]['qty:Main Store'], rows[0]['qty:Shop']), (5, 2))
+        self.assertEqual(Decimal(str(rows[0]['price:Offline/Counter'])), Decimal('12.50'))
+        self.assertEqual(Decimal(str(rows[1]['rate'])), Decimal('20'))
+
+    def test_unknown_type_is_rejected(self):
+        response = self.client.get('/api/products/products/export/', {'type': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_loads_into_an_empty_catalog(self):
+        content = self.export('csv')
+        self.assertEqual(ProductImporter().run(iter_csv_rows(io.BytesIO(content)))['created'], 0)
+
+        Product.objects.all().delete()
+        report = ProductImporter().run(iter_csv_rows(io.BytesIO(content)))
+
+        self.assertEqual(report['created'], 2, report)
+        self.assertEqual(self.quantity(Product.objects.get(unique_id='PEN00001'), self.main), 5)
+        self.assertEqual(self.quantity(Product.objects.get(unique_id='PEN00001'), self.shop), 2)
+
+
+# ----------------------------
+# Search
+# ----------------------------
+
+class ProductSearchTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.get(name='General')
+        for number, (name, brand) in enumerate([('Zebra Zebra', 'Zebra'), ('Zebra', ''), ('Zebra stripes', '')], start=1):
+            Product.objects.create(unique_id=f'ZZZ00000{number}', item_name=name, brand=brand, rate=1, category=category)
+
+    def ids(self, rows):
+        return [row['unique_id'] for row in rows]
+
+    def test_paged_search_keeps_rank_order(self):
+        ranked = self.ids(self.client.get('/api/products/products/', {'search': 'zebra'}).data)
+        self.assertEqual(ranked[0], 'ZZZ000001')
+
+        first = self.client.get('/api/products/products/', {'search': 'zebra', 'page_size': 2}).data
+        second = self.client.get(first['next']).data
+
+        self.assertEqual(self.ids(first['results']) + self.ids(second['results']), ranked)
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+    def test_unpaged_lists_still_use_the_cursor(self):
+        page = self.client.get('/api/products/products/', {'page_size': 2}).data
+        self.assertIn('cursor=', page['next'])
+
+    def test_punctuation_only_search_lists_everything(self):
+        for search in ('  ', '!!!', '"'):
+            response = self.client.get('/api/products/products/', {'search': search})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), Product.objects.count())
+
+
+# ----------------------------
+# Catalog sync
+# ----------------------------
+
+class CatalogSyncTests(StockTestCase):
+    def sync(self, since='0', limit=None):
+        params = {'since': since}
+        if limit:
+            params['limit'] = limit
+        response = self.client.get('/api/products/sync/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def age_changes(self, minutes):
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(minutes=minutes))
+
+    def test_pages_follow_the_token(self):
+        first = self.sync(limit=1)
+        self.assertTrue(first['has_more'])
+        self.assertEqual([p['unique_id'] for p in first['products']], ['PEN00001'])
+
+        rest = self.sync(first['token'])
+        self.assertFalse(rest['has_more'])
+        self.assertIn('INK00001', [p['unique_id'] for p in rest['products']])
+        self.assertNotIn('PEN00001', [p['unique_id'] for p in rest['products']])
+        self.assertEqual(self.sync(rest['token'])['products'], [])
+
+    def test_changes_and_deletions_are_sent(self):
+        token = self.sync()['token']
+        stock.apply_deltas({(self.ink.pk, self.main.pk): 4})
+        pen_id = self.pen.pk
+        self.pen.delete()
+
+        changes = self.sync(token)
+        self.assertEqual([p['id'] for p in changes['products']], [self.ink.pk])
+        self.assertEqual(changes['products'][0]['stock'], [{'location': self.main.pk, 'quantity': 4}])
+        self.assertEqual(changes['deleted'], [pen_id])
+
+    def test_late_commits_below_the_token_are_picked_up(self):
+        token = self.sync()['token']
+        last = int(token)
+        # An entry whose id was allocated first but commits after the next read
+        CatalogChange.objects.create(id=last + 2, product_id=self.ink.pk)
+        changes = self.sync(token)
+        self.assertEqual(changes['token'], f'{last + 2}:{last + 1}')
+
+        CatalogChange.objects.create(id=last + 1, product_id=self.pen.pk)
+        changes = self.sync(changes['token'])
+        self.assertEqual([p['id'] for p in changes['products']], [self.pen.pk])
+        self.assertEqual(changes['token'], str(last + 2))
+
+    def test_gaps_are_dropped_once_settled(self):
+        last = int(self.sync()['token'])
+        CatalogChange.objects.create(id=last + 2, product_id=self.ink.pk)
+        token = self.sync(str(last))['token']
+        self.assertIn(':', token)
+
+        self.age_changes(10)
+        self.assertEqual(self.sync(token)['token'], str(last + 2))
+
+    def test_bad_tokens_are_rejected(self):
+        for since in ['-1', 'abc', '5:7', '5:x']:
+            response = self.client.get('/api/products/sync/', {'since': since})
+            self.assertEqual(response.status_code, 400, since)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, CategoryViewSet, LocationViewSet, scan_barcode, PurchaseViewSet, generate_barcode
+from .views import ProductViewSet, CategoryViewSet, LocationViewSet, scan_barcode, PurchaseViewSet, generate_barcode, inventory_summary, scan_cache_stats, barcode_labels, catalog_sync
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
@@ -11,5 +11,9 @@ router.register(r'purchases', PurchaseViewSet, basename='purchase')
 urlpatterns = [
     path('', include(router.urls)),
     path('scan/', scan_barcode, name='scan_barcode'),
+    path('scan/cache-stats/', scan_cache_stats, name='scan_cache_stats'),
+    path('summary/', inventory_summary, name='inventory_summary'),
+    path('sync/', catalog_sync, name='catalog_sync'),
+    path('barcode/labels/', barcode_labels, name='barcode_labels'),
     path('barcode/<str:unique_id>/', generate_barcode, name='generate_barcode'),
 ]
\ No newline at end of file
@@ -1,58 +1,208 @@
 from rest_framework import viewsets, filters, status
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework.decorators import api_view, action
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Product, Category, Location, Purchase
-from .serializers import ProductSerializer, CategorySerializer, LocationSerializer, PurchaseSerializer, PurchaseDetailSerializer
-import io
-import barcode
-from barcode.writer import ImageWriter
-from django.http import HttpResponse
+from .models import Product, Category, Location, Purchase, PurchaseItem, PurchaseItemLocation, StockMovement
+from .serializers import ProductSerializer, CategorySerializer, LocationSerializer, PurchaseSerializer, PurchaseListSerializer, PurchaseDetailSerializer, StockMovementSerializer
+from .pagination import MovementCursorPagination, ProductCursorPagination, PurchaseCursorPagination
+from .filters import PurchaseFilter
+from .fieldsets import SparseFieldsetViewMixin, parse_field_list
+from .versions import ConditionalListMixin, catalog_version
+from .search import ProductSearchFilter
+from .summary import get_inventory_summary
+from . import analytics
+from .cache import scan_cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .barcodes import FORMATS, barcode_etag, get_barcode
+from .labels import encode_pages, render_label_sheet
+from .importer import ImportFormatError, import_products
+from .exporter import EXPORT_FORMATS, ExportFormatError, export_products
+from .sync import MAX_SYNC_BATCH_SIZE, SYNC_BATCH_SIZE, get_changes, parse_token
+from .stock import stock_at
+from datetime import datetime, time
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.core.files.storage import default_storage
+from django.conf import settings
+from django.views.static import serve
+from .images import INVOICE_DIR
+
+BARCODE_MAX_AGE = 60 * 60 * 24 * 365
+INVOICE_MAX_AGE = 60 * 60 * 24 * 365
+MAX_LABELS_PER_SHEET = 5000
 
 # ----------------------------
 # Product ViewSet
 # ----------------------------
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().order_by('-created_at')
+class ProductViewSet(ConditionalListMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.order_by('-created_at', 'id')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = ProductCursorPagination
 
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.OrderingFilter, ProductSearchFilter]
     search_fields = ['item_name', 'brand', 'serial_number']
     ordering_fields = ['item_name', 'rate', 'created_at']
+    ordering = ['-created_at', 'id']
+    # Category and location names are rendered inside each product
+    version_models = (Category, Location)
+
+    def get_list_versions(self):
+        return [catalog_version(), *super().get_list_versions()]
+
+    def get_queryset(self):
+        # Only join, prefetch and annotate what ?fields=/?expand= will render
+        queryset = super().get_queryset()
+        if self.wants('category'):
+            queryset = queryset.select_related('category')
+        if self.wants('locations'):
+            queryset = queryset.with_locations()
+        if self.wants('total_quantity'):
+            queryset = queryset.with_stock_total()
+        if not self.wants('description'):
+            queryset = queryset.defer('description')
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Upload a CSV or XLSX file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        flag = lambda name: str(request.data.get(name, '')).lower() in ('1', 'true', 'yes')
+        try:
+            report = import_products(
+                upload, upload.name,
+                dry_run=flag('dry_run'),
+                create_categories=flag('create_categories'),
+            )
+        except ImportFormatError as e:
+            # e.report lists what was committed before the file became unreadable
+            return Response({'error': str(e), **(e.report or {})}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        # Not `format`: DRF reserves that for renderer negotiation
+        fmt = request.query_params.get('type', 'csv').lower()
+        try:
+            stream = export_products(fmt)
+        except ExportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream, content_type=EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='movements')
+    def movements(self, request, pk=None):
+        """Ledger entries of one product, newest first; ?location=, ?from=, ?to= narrow it."""
+        params = request.query_params
+        movements = StockMovement.objects.filter(product_id=pk)
+        try:
+            if params.get('location'):
+                movements = movements.filter(location_id=int(params['location']))
+            if params.get('from'):
+                movements = movements.filter(created_at__gte=_parse_moment(params['from']))
+            if params.get('to'):
+                movements = movements.filter(created_at__lte=_parse_moment(params['to'], end_of_day=True))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = MovementCursorPagination()
+        page = paginator.paginate_queryset(movements, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(StockMovementSerializer(page, many=True).data)
+        movements = movements.order_by(*MovementCursorPagination.ordering)
+        return Response(StockMovementSerializer(movements, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='stock-at')
+    def stock_at(self, request, pk=None):
+        """Per-location stock of one product at ?at=<date or datetime> (end of day for dates)."""
+        try:
+            at = _parse_moment(request.query_params.get('at', ''), end_of_day=True)
+            location = request.query_params.get('location')
+            balances = stock_at(int(pk), at, location_id=int(location) if location else None)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'product': int(pk),
+            'at': at,
+            'locations': [{'location': loc, 'quantity': qty} for loc, qty in sorted(balances.items())],
+            'total_quantity': sum(balances.values()),
+        }, status=status.HTTP_200_OK)
 
-    def get_serializer_context(self):
-        return {'request': self.request}
+def _parse_moment(value, end_of_day=False):
+    """Parse an ISO date or datetime query parameter into an aware datetime."""
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"'{value}' is not an ISO date or datetime.")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
 # ----------------------------
 # Category ViewSet
 # ----------------------------
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    version_models = (Category,)
 
 # ----------------------------
 # Location ViewSet
 # ----------------------------
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    version_models = (Location,)
 
-class PurchaseViewSet(viewsets.ModelViewSet):
-    queryset = Purchase.objects.all().order_by('-purchase_date')
+class PurchaseViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = Purchase.objects.order_by('-purchase_date', 'id')
     serializer_class = PurchaseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, JSONParser]
+    pagination_class = PurchaseCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['supplier_name', 'payment_mode', 'purchase_date']
+    filterset_class = PurchaseFilter
     search_fields = ['supplier_name', 'invoice_number']
+    ordering = ['-purchase_date', 'id']
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PurchaseListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'purchase_details':
+            return queryset.select_related('created_by').prefetch_related(
+                Prefetch('items', queryset=PurchaseItem.objects.with_totals()),
+                Prefetch('items__item_locations', queryset=PurchaseItemLocation.objects.select_related('location')),
+            )
+        # List rows leave the lines out unless ?expand=items asks for them
+        with_items = self.expands('items') if self.action == 'list' else self.wants('items')
+        if with_items:
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=PurchaseItem.objects.with_totals()), 'items__item_locations'
+            )
+        if self.expands('created_by'):
+            queryset = queryset.select_related('created_by')
+        return queryset
 
     @action(detail=True, methods=['get'], url_path='details')
     def purchase_details(self, request, pk=None):
@@ -60,6 +210,34 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         serializer = PurchaseDetailSerializer(purchase)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def spend_analytics(self, request):
+        params = request.query_params
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            if params.get(name):
+                dates[name] = parse_date(params[name])
+                if dates[name] is None:
+                    return Response({'error': f'{name} must be a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        if dates.get('date_from') and dates.get('date_to') and dates['date_from'] > dates['date_to']:
+            return Response({'error': 'date_from must not be after date_to.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_by = parse_field_list(params.get('group_by')) or {'supplier_name'}
+        unknown = group_by - set(analytics.GROUP_FIELDS)
+        if unknown:
+            return Response(
+                {'error': f"Cannot group by {', '.join(sorted(unknown))}. Use {', '.join(analytics.GROUP_FIELDS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = analytics.get_spend(
+            supplier_name=params.get('supplier_name'),
+            purchased_by=params.get('purchased_by'),
+            group_by=tuple(field for field in analytics.GROUP_FIELDS if field in group_by),
+            **dates,
+        )
+        return Response(report)
+
 @api_view(['GET'])
 def scan_barcode(request):
     barcode = request.query_params.get('barcode')
@@ -67,26 +245,147 @@ def scan_barcode(request):
     if not barcode:
         return Response({'error': 'Barcode number is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Cached without a request so entries are host independent
+    payload = scan_cache.get(barcode)
+    if payload is None:
+        try:
+            product = Product.objects.with_stock().get(unique_id=barcode)
+        except Product.DoesNotExist:
+            return Response({'found': False, 'product': None}, status=status.HTTP_200_OK)
+        payload = dict(ProductSerializer(product).data)
+        scan_cache.set(barcode, payload)
+
+    product_data = dict(payload)
+    for field in ('image', 'image_thumbnail', 'image_medium'):
+        if product_data.get(field):
+            product_data[field] = request.build_absolute_uri(product_data[field])
+    return Response({'found': True, 'product': product_data}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def scan_cache_stats(request):
+    return Response(scan_cache.stats(), status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def catalog_sync(request):
+    """
+    Delta sync for offline catalog copies. Start with ?since=0, store the
+    returned token and send it back next time; repeat while has_more.
+    """
+    since = request.query_params.get('since', '0')
     try:
-        product = Product.objects.get(unique_id=barcode)
-        serializer = ProductSerializer(product, context={'request': request})
-        return Response({'found': True, 'product': serializer.data}, status=status.HTTP_200_OK)
-    except Product.DoesNotExist:
-        return Response({'found': False, 'product': None}, status=status.HTTP_200_OK)
+        parse_token(since)
+        limit = min(int(request.query_params.get('limit', SYNC_BATCH_SIZE)), MAX_SYNC_BATCH_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'since must be a sync token and limit a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = get_changes(since, limit)
+    for product in changes['products']:
+        if product['image_thumbnail']:
+            product['image_thumbnail'] = request.build_absolute_uri(default_storage.url(product['image_thumbnail']))
+    return Response(changes, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def inventory_summary(request):
+    summary = get_inventory_summary()
+
+    summary['stock_value'] = str(summary['stock_value'])
+    for row in summary['by_location'] + summary['by_category']:
+        row['stock_value'] = str(row['stock_value'])
+
+    return Response(summary, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 def generate_barcode(request, unique_id):
-    try:
-        # Use CODE128 (widely supported)
-        barcode_class = barcode.get_barcode_class('code128')
-        barcode_img = barcode_class(unique_id, writer=ImageWriter())
+    # Not `format`: DRF reserves that for renderer negotiation
+    fmt = request.query_params.get('type', 'png').lower()
+    if fmt not in FORMATS:
+        return Response({'error': f"Unsupported format '{fmt}'. Use png or svg."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Generate image in-memory (PNG)
-        buffer = io.BytesIO()
-        barcode_img.write(buffer, options={'module_width': 0.3, 'module_height': 15, 'font_size': 10})
-        buffer.seek(0)
+    # The image only depends on the code and writer options, so a matching
+    # ETag can be answered without rendering anything.
+    etag = barcode_etag(unique_id, fmt)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        patch_cache_control(not_modified, public=True, max_age=BARCODE_MAX_AGE, immutable=True)
+        return not_modified
 
-        return HttpResponse(buffer.getvalue(), content_type='image/png')
-    
+    try:
+        _, content_type, content = get_barcode(unique_id, fmt)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        return Response({'error': str(e)}, status=500)
+
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=BARCODE_MAX_AGE, immutable=True)
+    return response
+
+@api_view(['POST'])
+def barcode_labels(request):
+    """
+    Render many barcode labels into one printable sheet.
+
+    Body: {"labels": [{"unique_id": "...", "copies": 2}, ...] or [["...", 2], ...],
+           "columns": 3, "rows": 8, "dpi": 200, "type": "pdf" | "png", "page": 1}
+    """
+    raw_labels = request.data.get('labels')
+    if not isinstance(raw_labels, list) or not raw_labels:
+        return Response({'error': 'labels must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    labels = []
+    for entry in raw_labels:
+        if isinstance(entry, dict):
+            code, copies = entry.get('unique_id'), entry.get('copies', 1)
+        elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+            code, copies = entry
+        else:
+            return Response({'error': f'Invalid label entry: {entry}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(code, str) or not code or not isinstance(copies, int) or copies < 1:
+            return Response({'error': f'Invalid label entry: {entry}'}, status=status.HTTP_400_BAD_REQUEST)
+        labels.append((code, copies))
+
+    if sum(copies for _, copies in labels) > MAX_LABELS_PER_SHEET:
+        return Response({'error': f'At most {MAX_LABELS_PER_SHEET} labels per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        columns = int(request.data.get('columns', 3))
+        rows = int(request.data.get('rows', 8))
+        dpi = int(request.data.get('dpi', 200))
+        page = int(request.data.get('page', 1))
+    except (TypeError, ValueError):
+        return Response({'error': 'columns, rows, dpi and page must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (1 <= columns <= 10 and 1 <= rows <= 20 and 72 <= dpi <= 600):
+        return Response({'error': 'Use 1-10 columns, 1-20 rows and 72-600 dpi.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = str(request.data.get('type', 'pdf')).lower()
+    if fmt not in ('pdf', 'png'):
+        return Response({'error': f"Unsupported format '{fmt}'. Use pdf or png."}, status=status.HTTP_400_BAD_REQUEST)
+
+    codes = {code for code, _ in labels}
+    names = dict(Product.objects.filter(unique_id__in=codes).values_list('unique_id', 'item_name'))
+    missing = sorted(codes - names.keys())
+    if missing:
+        return Response({'error': 'Unknown barcodes.', 'missing': missing}, status=status.HTTP_400_BAD_REQUEST)
+
+    pages = render_label_sheet(labels, names, columns=columns, rows=rows, dpi=dpi)
+    if not 1 <= page <= len(pages):
+        return Response({'error': f'page must be between 1 and {len(pages)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    content_type = 'application/pdf' if fmt == 'pdf' else 'image/png'
+    response = HttpResponse(encode_pages(pages, fmt, dpi, page), content_type=content_type)
+    response['X-Total-Pages'] = str(len(pages))
+    response['Content-Disposition'] = f'inline; filename="labels.{fmt}"'
+    return response
+
+def serve_invoice(request, path):
+    """
+    Development server for MEDIA_ROOT/invoices/. Invoice names are content
+    hashes, so a name never points at different bytes and can be cached for
+    good; the production web server should send the same header.
+    """
+    response = serve(request, f'{INVOICE_DIR}/{path}', document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, max_age=INVOICE_MAX_AGE, immutable=True)
+    return response
@@ -1,5 +1,6 @@
 # sales/admin.py
 from django.contrib import admin
+from . import reports
 from .models import SalesChannel, SalesSection, SectionProductPrice, Sale, SaleItem
 
 @admin.register(SalesChannel)
@@ -37,4 +38,9 @@ class SaleAdmin(admin.ModelAdmin):
     list_display = ("id", "sale_datetime", "channel", "section", "invoice_number", "payment_mode", "total_amount", "discount", "created_by")
     list_filter = ("channel", "section", "payment_mode", "sale_datetime")
     search_fields = ("customer_name", "customer_mobile")
-    inlines = [SaleItemInline]
\ No newline at end of file
+    inlines = [SaleItemInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            reports.add_sale(obj)
@@ -0,0 +1,48 @@
+# sales/filters.py
+from datetime import datetime, time, timedelta
+
+import django_filters
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Sale
+
+
+def _moment(name, value, next_day=False):
+    """
+    A date or datetime string as an aware datetime. Plain dates become
+    midnight of that day, or of the next day with `next_day`.
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if next_day else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValidationError({name: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class SaleFilter(django_filters.FilterSet):
+    """
+    Exact section/channel/payment_mode/created_by filters plus a
+    ?date_from=&date_to= sale_datetime range. Bounds are compared against
+    sale_datetime directly, not its date, so the (field, sale_datetime)
+    indexes apply.
+    """
+    date_from = django_filters.CharFilter(method="filter_date_from")
+    date_to = django_filters.CharFilter(method="filter_date_to")
+
+    class Meta:
+        model = Sale
+        fields = ["section", "channel", "payment_mode", "created_by"]
+
+    def filter_date_from(self, queryset, name, value):
+        return queryset.filter(sale_datetime__gte=_moment(name, value))
+
+    def filter_date_to(self, queryset, name, value):
+        # A plain date includes that whole day
+        if parse_date(value) is not None:
+            return queryset.filter(sale_datetime__lt=_moment(name, value, next_day=True))
+        return queryset.filter(sale_datetime__lte=_moment(name, value))
@@ -0,0 +1,29 @@
+# sales/management/commands/rebuild_sales_rollups.py
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sales import reports
+
+class Command(BaseCommand):
+    help = "Recompute the hourly and daily SalesRollup rows from Sale and SaleItem"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", help="First day, YYYY-MM-DD (default: everything)")
+        parser.add_argument("--to", dest="last", help="Last day, YYYY-MM-DD, inclusive (default: everything)")
+
+    def _day(self, value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date '{value}', use YYYY-MM-DD.")
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        start, last = self._day(options["first"]), self._day(options["last"])
+        end = last + timedelta(days=1) if last else None
+        rows = reports.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} sales rollup rows"))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    # Continue after the highest number already issued for each (section, day)
+    Sale = apps.get_model('sales', 'Sale')
+    InvoiceCounter = apps.get_model('sales', 'InvoiceCounter')
+
+    counts, highest = {}, {}
+    for section_id, section_name, sale_datetime, invoice_number in Sale.objects.values_list(
+        'section_id', 'section__name', 'sale_datetime', 'invoice_number'
+    ).iterator():
+        key = (section_id, sale_datetime.date())
+        counts[key] = counts.get(key, 0) + 1
+        head = f"{section_name[:3].upper()}{sale_datetime:%y%m%d}"
+        if invoice_number and invoice_number.startswith(head) and invoice_number[len(head):].isdigit():
+            highest[key] = max(highest.get(key, 0), int(invoice_number[len(head):]))
+    last = {key: max(count, highest.get(key, 0)) for key, count in counts.items()}
+
+    InvoiceCounter.objects.bulk_create(
+        [InvoiceCounter(section_id=section_id, day=day, last_number=number) for (section_id, day), number in last.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_sale_invoice_number_saleitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_counters', to='sales.salessection')),
+            ],
+            options={
+                'unique_together': {('section', 'day')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_invoicecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['section', 'sale_datetime'], name='sale_section_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['channel', 'sale_datetime'], name='sale_channel_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['payment_mode', 'sale_datetime'], name='sale_payment_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_by', 'sale_datetime'], name='sale_created_by_dt_idx'),
+        ),
+    ]
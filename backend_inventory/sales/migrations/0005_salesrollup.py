@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+
+def seed_rollups(apps, schema_editor):
+    # Hourly and daily totals of the sales already recorded
+    Sale = apps.get_model('sales', 'Sale')
+    SaleItem = apps.get_model('sales', 'SaleItem')
+    SalesRollup = apps.get_model('sales', 'SalesRollup')
+    zero = Decimal('0')
+
+    rows = {}
+    for grain in ('hour', 'day'):
+        for row in Sale.objects.annotate(period=Trunc('sale_datetime', grain)).values(
+            'period', 'section_id', 'channel_id', 'payment_mode'
+        ).annotate(
+            count=Count('id'), discount_sum=Coalesce(Sum('discount'), zero), net=Coalesce(Sum('total_amount'), zero)
+        ).order_by():
+            rows[grain, row['period'], row['section_id'], row['payment_mode']] = SalesRollup(
+                grain=grain, period=row['period'], section_id=row['section_id'], channel_id=row['channel_id'],
+                payment_mode=row['payment_mode'], sales=row['count'], discount=row['discount_sum'], net=row['net'],
+            )
+        for row in SaleItem.objects.annotate(period=Trunc('sale__sale_datetime', grain)).values(
+            'period', 'sale__section_id', 'sale__payment_mode'
+        ).annotate(count=Count('id'), gross=Coalesce(Sum('total'), zero)).order_by():
+            rollup = rows[grain, row['period'], row['sale__section_id'], row['sale__payment_mode']]
+            rollup.items, rollup.gross = row['count'], row['gross']
+
+    SalesRollup.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_sale_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('period', models.DateTimeField()),
+                ('payment_mode', models.CharField(max_length=20)),
+                ('sales', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='sales.saleschannel')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='sales.salessection')),
+            ],
+            options={
+                'unique_together': {('grain', 'period', 'section', 'payment_mode')},
+            },
+        ),
+        migrations.RunPython(seed_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 # sales/models.py
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
 # Use string app labels to avoid circular imports; they match your current setup
@@ -84,6 +84,13 @@ class Sale(models.Model):
 
     class Meta:
         ordering = ["-sale_datetime"]
+        # Report filters narrow by one of these, then page by sale_datetime
+        indexes = [
+            models.Index(fields=["section", "sale_datetime"], name="sale_section_dt_idx"),
+            models.Index(fields=["channel", "sale_datetime"], name="sale_channel_dt_idx"),
+            models.Index(fields=["payment_mode", "sale_datetime"], name="sale_payment_dt_idx"),
+            models.Index(fields=["created_by", "sale_datetime"], name="sale_created_by_dt_idx"),
+        ]
 
     def __str__(self):
         return f"Sale #{self.pk} • {self.channel.name}/{self.section.name} • {self.sale_datetime:%Y-%m-%d %H:%M}"
@@ -112,4 +119,67 @@ class SaleItem(models.Model):
     location = models.ForeignKey("products.Location", on_delete=models.PROTECT, related_name="sale_items")
 
     def __str__(self):
-        return f"{self.product_name} x {self.quantity} = {self.total}"
\ No newline at end of file
+        return f"{self.product_name} x {self.quantity} = {self.total}"
+
+class InvoiceCounter(models.Model):
+    """
+    Last invoice number handed out per (section, day). Numbers are allocated
+    with one locking UPDATE on this row instead of counting the day's sales.
+    """
+    section = models.ForeignKey(SalesSection, on_delete=models.CASCADE, related_name="invoice_counters")
+    day = models.DateField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (("section", "day"),)
+
+    def __str__(self):
+        return f"{self.section} {self.day:%Y-%m-%d}: {self.last_number}"
+
+    @classmethod
+    def next_number(cls, section, day):
+        """
+        Allocate the next number for (section, day). Must run inside the
+        transaction that uses it: the UPDATE keeps the row locked until
+        commit, so concurrent checkouts in a section queue up instead of
+        colliding.
+        """
+        counter = cls.objects.filter(section=section, day=day)
+        if not counter.update(last_number=models.F("last_number") + 1):
+            try:
+                # First sale of the day; a concurrent first sale may win the insert
+                with transaction.atomic():
+                    cls.objects.create(section=section, day=day, last_number=1)
+                return 1
+            except IntegrityError:
+                counter.update(last_number=models.F("last_number") + 1)
+        return counter.values_list("last_number", flat=True).get()
+
+
+class SalesRollup(models.Model):
+    """
+    Sales totals per hour and per day for each (section, payment_mode),
+    kept up to date by sales.reports so reports never scan Sale rows.
+    `period` is the start of the hour or day in the current time zone.
+    """
+    HOUR = "hour"
+    DAY = "day"
+    GRAIN_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES)
+    period = models.DateTimeField()
+    section = models.ForeignKey(SalesSection, on_delete=models.CASCADE, related_name="rollups")
+    channel = models.ForeignKey(SalesChannel, on_delete=models.CASCADE, related_name="rollups")
+    payment_mode = models.CharField(max_length=20)
+
+    sales = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+    gross = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = (("grain", "period", "section", "payment_mode"),)
+
+    def __str__(self):
+        return f"{self.grain} {self.period:%Y-%m-%d %H:00} {self.section_id}/{self.payment_mode}: {self.net}"
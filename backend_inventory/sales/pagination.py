@@ -0,0 +1,6 @@
+# sales/pagination.py
+from products.pagination import OptionalCursorPagination
+
+
+class SaleCursorPagination(OptionalCursorPagination):
+    ordering = ("-sale_datetime", "-id")
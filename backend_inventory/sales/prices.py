@@ -0,0 +1,97 @@
+# sales/prices.py
+from django.db import transaction
+from rest_framework import serializers
+
+from products import sync
+from products.models import Product
+from .models import SectionProductPrice
+
+CHUNK_SIZE = 1000
+
+_price_field = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _product_id(value):
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+    return None
+
+def validate_items(items):
+    """
+    Check every {"product", "price"} row up front. Returns ({product_id: price},
+    rejected) where rejected is [{"row": index, "errors": {...}}, ...].
+    """
+    accepted, rejected, seen = [], [], set()
+    for index, row in enumerate(items):
+        row = row if isinstance(row, dict) else {}
+        errors = {}
+        product_id = _product_id(row.get("product"))
+        if product_id is None:
+            errors["product"] = "A product id is required."
+        elif product_id in seen:
+            errors["product"] = "Duplicate product earlier in the list."
+        seen.add(product_id)
+        try:
+            price = _price_field.run_validation(row.get("price"))
+        except serializers.ValidationError as e:
+            errors["price"] = e.detail[0]
+        if errors:
+            rejected.append({"row": index, "errors": errors})
+        else:
+            accepted.append((index, product_id, price))
+
+    known = set()
+    for chunk in _chunks(product_id for _, product_id, _ in accepted):
+        known.update(Product.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+
+    prices = {}
+    for index, product_id, price in accepted:
+        if product_id in known:
+            prices[product_id] = price
+        else:
+            rejected.append({"row": index, "errors": {"product": f"Product {product_id} does not exist."}})
+    rejected.sort(key=lambda error: error["row"])
+    return prices, rejected
+
+@transaction.atomic
+def set_prices(section_ids, prices):
+    """
+    Upsert the price of every (section, product) pair with chunked
+    INSERT ... ON CONFLICT UPDATE statements, skipping pairs whose price is
+    already right. Returns {"created", "updated", "unchanged"} counts.
+    """
+    current = {}
+    for chunk in _chunks(prices):
+        current.update(
+            ((section_id, product_id), price)
+            for section_id, product_id, price in SectionProductPrice.objects.filter(
+                section_id__in=section_ids, product_id__in=chunk
+            ).values_list("section_id", "product_id", "price")
+        )
+
+    rows, counts = [], {"created": 0, "updated": 0, "unchanged": 0}
+    for section_id in section_ids:
+        for product_id, price in prices.items():
+            existing = current.get((section_id, product_id))
+            if existing == price:
+                counts["unchanged"] += 1
+                continue
+            counts["created" if existing is None else "updated"] += 1
+            rows.append(SectionProductPrice(section_id=section_id, product_id=product_id, price=price))
+
+    SectionProductPrice.objects.bulk_create(
+        rows,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=["section", "product"],
+        update_fields=["price"],
+    )
+    # bulk_create skips the post_save signal that journals price changes
+    sync.record_changes(row.product_id for row in rows)
+    return counts
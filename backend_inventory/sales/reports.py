@@ -0,0 +1,279 @@
+# sales/reports.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .models import Sale, SaleItem, SalesRollup
+
+GRAINS = (SalesRollup.HOUR, SalesRollup.DAY)
+METRICS = ("sales", "items", "gross", "discount", "net")
+# Sale fields a rollup contribution depends on
+STATE_FIELDS = ("section_id", "channel_id", "payment_mode", "sale_datetime", "discount", "total_amount")
+
+# ----------------------------
+# Periods
+# ----------------------------
+
+def floor(moment, grain):
+    """Start of the hour or day (current time zone) containing `moment`."""
+    local = timezone.localtime(moment)
+    if grain == SalesRollup.HOUR:
+        return local.replace(minute=0, second=0, microsecond=0)
+    return timezone.make_aware(datetime.combine(local.date(), time.min))
+
+def ceil(moment, grain):
+    start = floor(moment, grain)
+    if start == moment:
+        return start
+    if grain == SalesRollup.HOUR:
+        return start + timedelta(hours=1)
+    return timezone.make_aware(datetime.combine(timezone.localtime(start).date() + timedelta(days=1), time.min))
+
+def _new_cell():
+    # [sales, items, gross, discount, net]
+    return [0, 0, Decimal("0"), Decimal("0"), Decimal("0")]
+
+# ----------------------------
+# Incremental updates
+# ----------------------------
+
+def _apply(cells):
+    """
+    Add {(grain, period, section_id, channel_id, payment_mode): cell} to the
+    rollup rows with one F() update each, creating missing rows.
+    """
+    for (grain, period, section_id, channel_id, payment_mode), (sales, items, gross, discount, net) in cells.items():
+        rows = SalesRollup.objects.filter(grain=grain, period=period, section_id=section_id, payment_mode=payment_mode)
+        change = dict(
+            sales=F("sales") + sales, items=F("items") + items, gross=F("gross") + gross,
+            discount=F("discount") + discount, net=F("net") + net,
+        )
+        if rows.update(**change):
+            if sales < 0:
+                # Drop periods whose last sale just left them
+                rows.filter(sales=0).delete()
+            continue
+        try:
+            # A concurrent sale may create the same row first
+            with transaction.atomic():
+                SalesRollup.objects.create(
+                    grain=grain, period=period, section_id=section_id, channel_id=channel_id,
+                    payment_mode=payment_mode, sales=sales, items=items, gross=gross, discount=discount, net=net,
+                )
+        except IntegrityError:
+            rows.update(**change)
+
+def _contribution(state, items, gross, sign):
+    """Cells a sale adds (sign=1) or removes (sign=-1). `state` is a Sale or its remembered values."""
+    cells = {}
+    for grain in GRAINS:
+        key = (grain, floor(state["sale_datetime"], grain), state["section_id"], state["channel_id"], state["payment_mode"])
+        cells[key] = [sign, sign * items, sign * gross, sign * Decimal(state["discount"]), sign * Decimal(state["total_amount"])]
+    return cells
+
+def _state(sale):
+    return {field: getattr(sale, field) for field in STATE_FIELDS}
+
+def _line_totals(sale_id):
+    totals = SaleItem.objects.filter(sale_id=sale_id).aggregate(
+        items=Count("id"), gross=Coalesce(Sum("total"), Decimal("0"))
+    )
+    return totals["items"], totals["gross"]
+
+def add_sale(sale, lines=None):
+    """
+    Count a new sale. `lines` are its SaleItem objects when the caller has
+    them in memory; otherwise they are aggregated from the database.
+    """
+    if lines is None:
+        items, gross = _line_totals(sale.pk)
+    else:
+        items, gross = len(lines), sum((Decimal(line.total) for line in lines), Decimal("0"))
+    _apply(_contribution(_state(sale), items, gross, 1))
+
+def remove_sale(sale):
+    """
+    Take a deleted sale's count, discount and net out of the rollups. Its
+    lines are taken out one by one by remove_line as the delete cascades.
+    """
+    _apply(_contribution(_state(sale), 0, Decimal("0"), -1))
+
+def move_sale(previous, sale):
+    """Re-file an edited sale whose time, section, payment mode or amounts changed."""
+    current = _state(sale)
+    if all(previous[field] == current[field] for field in STATE_FIELDS):
+        return
+    items, gross = _line_totals(sale.pk)
+    cells = defaultdict(_new_cell)
+    for part in (_contribution(previous, items, gross, -1), _contribution(current, items, gross, 1)):
+        for key, values in part.items():
+            cells[key] = [a + b for a, b in zip(cells[key], values)]
+    _apply({key: values for key, values in cells.items() if any(values)})
+
+def _change_lines(sale_id, items, gross):
+    state = Sale.objects.filter(pk=sale_id).values(*STATE_FIELDS).first()
+    if state is None or not (items or gross):
+        return
+    cells = {}
+    for grain in GRAINS:
+        key = (grain, floor(state["sale_datetime"], grain), state["section_id"], state["channel_id"], state["payment_mode"])
+        cells[key] = [0, items, gross, Decimal("0"), Decimal("0")]
+    _apply(cells)
+
+def add_line(line):
+    """Count a SaleItem added to an existing sale."""
+    _change_lines(line.sale_id, 1, Decimal(line.total))
+
+def remove_line(line):
+    """Take a SaleItem out of its sale's line count and gross."""
+    _change_lines(line.sale_id, -1, -Decimal(line.total))
+
+def move_line(previous, line):
+    """Re-file a SaleItem whose total or sale changed; `previous` holds the old `sale_id` and `total`."""
+    if previous["sale_id"] == line.sale_id:
+        _change_lines(line.sale_id, 0, Decimal(line.total) - previous["total"])
+    else:
+        _change_lines(previous["sale_id"], -1, -previous["total"])
+        add_line(line)
+
+# ----------------------------
+# Aggregating sales
+# ----------------------------
+
+def aggregate_sales(sales, grain):
+    """
+    {(grain, period, section_id, channel_id, payment_mode): cell} for a Sale
+    queryset, with one grouped query for the sales and one for their lines.
+    """
+    cells = defaultdict(_new_cell)
+    for row in sales.annotate(period=Trunc("sale_datetime", grain)).values(
+        "period", "section_id", "channel_id", "payment_mode"
+    ).annotate(
+        sales=Count("id"),
+        discount=Coalesce(Sum("discount"), Decimal("0")),
+        net=Coalesce(Sum("total_amount"), Decimal("0")),
+    ).order_by():
+        cell = cells[grain, row["period"], row["section_id"], row["channel_id"], row["payment_mode"]]
+        cell[0] += row["sales"]
+        cell[3] += row["discount"]
+        cell[4] += row["net"]
+
+    for row in SaleItem.objects.filter(sale__in=sales).annotate(period=Trunc("sale__sale_datetime", grain)).values(
+        "period", "sale__section_id", "sale__channel_id", "sale__payment_mode"
+    ).annotate(items=Count("id"), gross=Coalesce(Sum("total"), Decimal("0"))).order_by():
+        cell = cells[grain, row["period"], row["sale__section_id"], row["sale__channel_id"], row["sale__payment_mode"]]
+        cell[1] += row["items"]
+        cell[2] += row["gross"]
+    return cells
+
+# ----------------------------
+# Full rebuild
+# ----------------------------
+
+@transaction.atomic
+def rebuild(start=None, end=None):
+    """
+    Recompute the rollup rows of [start, end), or of everything. Bounds are
+    widened to whole days so no period is left half counted. Returns the
+    number of rows written.
+    """
+    sales = Sale.objects.all()
+    rollups = SalesRollup.objects.all()
+    if start is not None:
+        start = floor(start, SalesRollup.DAY)
+        sales, rollups = sales.filter(sale_datetime__gte=start), rollups.filter(period__gte=start)
+    if end is not None:
+        end = ceil(end, SalesRollup.DAY)
+        sales, rollups = sales.filter(sale_datetime__lt=end), rollups.filter(period__lt=end)
+    rollups.delete()
+
+    rows = []
+    for grain in GRAINS:
+        for (grain, period, section_id, channel_id, payment_mode), values in aggregate_sales(sales, grain).items():
+            rows.append(SalesRollup(
+                grain=grain, period=period, section_id=section_id, channel_id=channel_id,
+                payment_mode=payment_mode, **dict(zip(METRICS, values)),
+            ))
+    SalesRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+# ----------------------------
+# Reading
+# ----------------------------
+
+def _cover(start, end, grains):
+    """
+    Split [start, end) into (grain, lo, hi) pieces: whole periods of the
+    coarsest grain that fits, finer grains towards the edges, and None
+    (live Sale rows) for what is left over.
+    """
+    if start >= end:
+        return []
+    if not grains:
+        return [(None, start, end)]
+    grain, finer = grains[0], grains[1:]
+    lo, hi = ceil(start, grain), floor(end, grain)
+    if lo >= hi:
+        return _cover(start, end, finer)
+    return _cover(start, lo, finer) + [(grain, lo, hi)] + _cover(hi, end, finer)
+
+def _rollup_cells(grain, start, end, filters):
+    cells = {}
+    for row in SalesRollup.objects.filter(grain=grain, period__gte=start, period__lt=end, **filters).values(
+        "period", "section_id", "channel_id", "payment_mode", *METRICS
+    ):
+        key = (grain, row["period"], row["section_id"], row["channel_id"], row["payment_mode"])
+        cells[key] = [row[metric] for metric in METRICS]
+    return cells
+
+def get_report(start, end, group_by=("day",), section=None, channel=None, payment_mode=None):
+    """
+    Sales, line items, gross, discount and net for [start, end), grouped by
+    any of day, hour, section, channel and payment_mode. Whole days and hours
+    are read from the rollups; only the minutes at either edge that do not
+    fill an hour are aggregated from Sale rows.
+    """
+    filters = {}
+    if section is not None:
+        filters["section_id"] = section
+    if channel is not None:
+        filters["channel_id"] = channel
+    if payment_mode is not None:
+        filters["payment_mode"] = payment_mode
+
+    grains = [SalesRollup.HOUR] if "hour" in group_by else [SalesRollup.DAY, SalesRollup.HOUR]
+    groups = defaultdict(_new_cell)
+    for grain, lo, hi in _cover(start, end, grains):
+        if grain is None:
+            cells = aggregate_sales(
+                Sale.objects.filter(sale_datetime__gte=lo, sale_datetime__lt=hi, **filters), grains[-1]
+            )
+        else:
+            cells = _rollup_cells(grain, lo, hi, filters)
+
+        for (_, period, section_id, channel_id, mode), values in cells.items():
+            dims = {
+                "day": timezone.localtime(floor(period, SalesRollup.DAY)).date(),
+                "hour": timezone.localtime(period),
+                "section": section_id,
+                "channel": channel_id,
+                "payment_mode": mode,
+            }
+            group = groups[tuple(dims[field] for field in group_by)]
+            for i, value in enumerate(values):
+                group[i] += value
+
+    rows = []
+    totals = dict(zip(METRICS, _new_cell()))
+    for key, values in sorted(groups.items(), key=lambda item: tuple(str(part) for part in item[0])):
+        row = dict(zip(group_by, key))
+        row.update(zip(METRICS, values))
+        rows.append(row)
+        for metric, value in zip(METRICS, values):
+            totals[metric] += value
+    return {"date_from": start, "date_to": end, "group_by": list(group_by), "totals": totals, "rows": rows}
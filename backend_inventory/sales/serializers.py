@@ -1,10 +1,14 @@
 # sales/serializers.py
+from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
 from django.db import transaction
-from django.db.models import F
 from rest_framework import serializers
-from .models import SalesChannel, SalesSection, SectionProductPrice, Sale, SaleItem
-from products.models import Product, ProductLocation, Location
+from .models import SalesChannel, SalesSection, SectionProductPrice, Sale, SaleItem, InvoiceCounter
+from products.models import Product, ProductLocation, Location, StockMovement
+from products import stock
+from products.stock import movement_source
+from products.fieldsets import SparseFieldsetMixin
+from . import reports
 from django.utils import timezone
 from django.db.models import Count
 
@@ -56,6 +60,9 @@ class SaleItemWriteSerializer(serializers.Serializer):
         # Small rounding safety
         if quantize_money(q * p) != quantize_money(t):
             raise serializers.ValidationError("Item total must equal price * quantity.")
+        # Stock is counted in whole units; only free-text lines may be fractional
+        if data.get("product") and q != q.to_integral_value():
+            raise serializers.ValidationError({"quantity": "Stocked products are sold in whole units."})
         return data
 
 
@@ -77,7 +84,7 @@ class SaleItemReadSerializer(serializers.ModelSerializer):
         ]
 
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Write with `items_write`, read with `items`.
     """
@@ -101,6 +108,10 @@ class SaleSerializer(serializers.ModelSerializer):
             "items",
             "items_write",
         ]
+        expandable_fields = {
+            "channel": (SalesChannelSerializer, {}),
+            "section": (SalesSectionSerializer, {}),
+        }
 
     def validate(self, attrs):
         section = attrs.get("section") or getattr(self.instance, "section", None)
@@ -121,9 +132,8 @@ class SaleSerializer(serializers.ModelSerializer):
         prefix = section.name[:3].upper()
         date_part = today.strftime("%y%m%d")
 
-        # Count how many sales exist today for this section
-        daily_count = Sale.objects.filter(section=section, sale_datetime__date=today).count()
-        next_number = daily_count + 1
+        # Per-(section, day) counter, locked until this sale commits
+        next_number = InvoiceCounter.next_number(section, today)
 
         invoice_number = f"{prefix}{date_part}{next_number:03d}"  # zero-padded 3 digits
         validated_data["invoice_number"] = invoice_number
@@ -134,17 +144,16 @@ class SaleSerializer(serializers.ModelSerializer):
         # Resolve stock location from section
         location = sale.section.location
 
-        # Optional: enforce non-negative stock
-        enforce_stock = True
+        # Every referenced product in one IN query
+        product_ids = {item["product"] for item in items_data if item.get("product")}
+        products = Product.objects.in_bulk(product_ids)
 
         # Build items and collect stock adjustments
         to_create = []
-        stock_moves = []  # (product_id, qty)
-        
+        deltas = defaultdict(int)  # (product_id, location_id) -> -qty
+
         for item in items_data:
-            product_obj = None
-            if item.get("product"):
-                product_obj = Product.objects.filter(pk=item["product"]).first()
+            product_obj = products.get(item.get("product"))
 
             to_create.append(SaleItem(
                 sale=sale,
@@ -161,32 +170,41 @@ class SaleSerializer(serializers.ModelSerializer):
             ))
 
             if product_obj:
-                stock_moves.append((product_obj.id, item["quantity"]))
+                deltas[product_obj.id, location.id] -= int(item["quantity"])
 
         # Create all items at once
         SaleItem.objects.bulk_create(to_create)
 
-        # Deduct stock per ProductLocation (lock rows for safe concurrent sales)
-        for product_id, qty in stock_moves:
-            pl = ProductLocation.objects.select_for_update().filter(
-                product_id=product_id, location=location
-            ).first()
-
-            if not pl:
-                if enforce_stock:
-                    raise serializers.ValidationError(
-                        f"No stock record for product {product_id} at {location.name}."
-                    )
-                # else, create it as zero then go negative:
-                pl = ProductLocation.objects.create(product_id=product_id, location=location, quantity=0)
-
-            # Check & deduct
-            if enforce_stock and pl.quantity < qty:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for product {product_id} at {location.name} (have {pl.quantity}, need {qty})."
-                )
-
-            pl.quantity = F("quantity") - qty
-            pl.save(update_fields=["quantity"])
+        # Deduct stock as one batch: rows locked in id order, shortfalls
+        # checked in memory, then a single bulk update
+        try:
+            with movement_source(StockMovement.SALE, sale.pk):
+                stock.apply_deltas(deltas)
+        except stock.InsufficientStock as e:
+            raise serializers.ValidationError({"items_write": self._shortage_errors(items_data, location, e.shortages)})
+
+        # Count it in the hourly/daily report rollups, in this same transaction
+        reports.add_sale(sale, to_create)
 
         return sale
+
+    def _shortage_errors(self, items_data, location, shortages):
+        """One entry per cart line, like nested serializer errors; {} for lines that are fine."""
+        short = {product_id: (available, -delta) for product_id, _, available, delta in shortages}
+        stocked = set(ProductLocation.objects.filter(
+            product_id__in=short, location=location
+        ).values_list("product_id", flat=True))
+
+        errors = []
+        for item in items_data:
+            product_id = item.get("product")
+            if product_id not in short:
+                errors.append({})
+            elif product_id not in stocked:
+                errors.append({"quantity": [f"No stock record for product {product_id} at {location.name}."]})
+            else:
+                available, needed = short[product_id]
+                errors.append({"quantity": [
+                    f"Insufficient stock for product {product_id} at {location.name} (have {available}, need {needed})."
+                ]})
+        return errors
@@ -0,0 +1,81 @@
+# sales/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from products import sync, versions
+from . import reports
+from .models import Sale, SaleItem, SalesChannel, SalesSection, SectionProductPrice
+
+
+@receiver(post_save, sender=SectionProductPrice)
+@receiver(post_delete, sender=SectionProductPrice)
+def record_price_change(sender, instance, raw=False, **kwargs):
+    # Section prices travel with their product in the catalog sync
+    if not raw:
+        sync.record_changes([instance.product_id])
+
+
+@receiver(post_save, sender=SalesChannel)
+@receiver(post_delete, sender=SalesChannel)
+@receiver(post_save, sender=SalesSection)
+@receiver(post_delete, sender=SalesSection)
+def bump_reference_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(sender)
+
+
+# ----------------------------
+# Sales rollups
+# ----------------------------
+# New sales are counted by SaleSerializer.create (and SaleAdmin), once their
+# lines exist; edits and deletes are followed here.
+
+@receiver(pre_save, sender=Sale)
+def remember_rollup_state(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = Sale.objects.filter(pk=instance.pk).values(*reports.STATE_FIELDS).first()
+    if previous is not None:
+        instance._rollup_state = previous
+
+
+@receiver(post_save, sender=Sale)
+def move_rollup_state(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop("_rollup_state", None)
+    if not raw and not created and previous is not None:
+        reports.move_sale(previous, instance)
+
+
+@receiver(pre_delete, sender=Sale)
+def remove_from_rollups(sender, instance, **kwargs):
+    reports.remove_sale(instance)
+
+
+# SaleSerializer.create bulk-creates lines, so these only see lines added,
+# edited or deleted one at a time, e.g. in the admin
+
+@receiver(pre_save, sender=SaleItem)
+def remember_line_state(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = SaleItem.objects.filter(pk=instance.pk).values("sale_id", "total").first()
+    if previous is not None:
+        instance._rollup_state = previous
+
+
+@receiver(post_save, sender=SaleItem)
+def update_line_rollups(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop("_rollup_state", None)
+    if raw:
+        return
+    if created:
+        reports.add_line(instance)
+    elif previous is not None:
+        reports.move_line(previous, instance)
+
+
+@receiver(pre_delete, sender=SaleItem)
+def remove_line_from_rollups(sender, instance, **kwargs):
+    # Deleting a sale cascades here before the sale's own pre_delete, while
+    # the sale row still exists to say which rollup cells the line is in
+    reports.remove_line(instance)
@@ -1,3 +1,342 @@
+# sales/tests.py
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import CatalogChange, Category, Location, Product, ProductLocation, StockMovement
+from . import reports
+from .models import InvoiceCounter, Sale, SaleItem, SalesChannel, SalesRollup, SalesSection, SectionProductPrice
+
+
+class SaleTestCase(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+        category = Category.objects.create(name="General")
+        self.shop = Location.objects.create(name="Shop")
+        self.store = Location.objects.create(name="Store")
+        self.channel = SalesChannel.objects.create(name="Offline")
+        self.section = SalesSection.objects.create(channel=self.channel, name="Counter", location=self.shop)
+
+        self.pen = Product.objects.create(unique_id="PEN00001", item_name="Pen", rate=10, category=category)
+        self.ink = Product.objects.create(unique_id="INK00001", item_name="Ink", rate=20, category=category)
+        self.pad = Product.objects.create(unique_id="PAD00001", item_name="Pad", rate=5, category=category)
+        ProductLocation.objects.create(product=self.pen, location=self.shop, quantity=3)
+        ProductLocation.objects.create(product=self.ink, location=self.shop, quantity=5)
+        ProductLocation.objects.create(product=self.pad, location=self.store, quantity=5)
+
+    def line(self, product, quantity, price=1):
+        return {
+            "product": product.pk if product else None,
+            "product_name": product.item_name if product else "Misc",
+            "price": str(price),
+            "quantity": str(quantity),
+            "total": str(price * quantity),
+        }
+
+    def post_sale(self, items, section=None):
+        return self.client.post("/api/sales/sales/", {
+            "channel": self.channel.pk,
+            "section": (section or self.section).pk,
+            "payment_mode": "Cash",
+            "discount": "0",
+            "total_amount": str(sum(float(item["total"]) for item in items)),
+            "items_write": items,
+        }, format="json")
+
+    def quantity(self, product, location):
+        return ProductLocation.objects.get(product=product, location=location).quantity
+
+
+# ----------------------------
+# Stock
+# ----------------------------
+
+class SaleStockTests(SaleTestCase):
+    def test_sale_deducts_stock_once_per_product(self):
+        response = self.post_sale([self.line(self.pen, 1), self.line(self.pen, 2), self.line(self.ink, 1)])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.quantity(self.pen, self.shop), 0)
+        self.assertEqual(self.quantity(self.ink, self.shop), 4)
+        self.assertEqual(StockMovement.objects.filter(
+            source_type=StockMovement.SALE, source_id=response.data["id"]
+        ).count(), 2)
+
+    def test_shortages_are_reported_per_line(self):
+        response = self.post_sale([
+            self.line(self.pen, 2),
+            self.line(self.ink, 1),
+            self.line(self.pen, 2),   # 4 pens in total, only 3 in stock
+            self.line(self.pad, 1),   # stocked only at another location
+            self.line(None, 1),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data["items_write"]
+        self.assertEqual(len(errors), 5)
+        self.assertEqual([bool(error) for error in errors], [True, False, True, True, False])
+        self.assertIn("have 3, need 4", str(errors[0]["quantity"][0]))
+        self.assertIn("No stock record", str(errors[3]["quantity"][0]))
+
+    def test_stocked_products_are_sold_in_whole_units(self):
+        response = self.post_sale([self.line(self.ink, 1.5), self.line(None, 0.25)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data["items_write"][0])
+        self.assertEqual(response.data["items_write"][1], {})
+        self.assertEqual(self.quantity(self.ink, self.shop), 5)
+
+    def test_failed_sale_changes_nothing(self):
+        response = self.post_sale([self.line(self.ink, 1), self.line(self.pen, 4)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(self.quantity(self.pen, self.shop), 3)
+        self.assertEqual(self.quantity(self.ink, self.shop), 5)
+        self.assertFalse(StockMovement.objects.filter(source_type=StockMovement.SALE).exists())
+        self.assertFalse(InvoiceCounter.objects.exists())
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+
+class SaleFieldsetTests(SaleTestCase):
+    def test_fields_and_expand_shape_sale_rows(self):
+        self.post_sale([self.line(self.ink, 2, price=3)])
+
+        with self.assertNumQueries(1):
+            rows = self.client.get("/api/sales/sales/", {"fields": "id,total_amount"}).data
+        self.assertEqual(set(rows[0]), {"id", "total_amount"})
+
+        row = self.client.get("/api/sales/sales/", {"fields": "id", "expand": "section,channel"}).data[0]
+        self.assertEqual(set(row), {"id", "section", "channel"})
+        self.assertEqual(row["section"]["name"], "Counter")
+        self.assertEqual(row["channel"]["name"], "Offline")
+
+        row = self.client.get("/api/sales/sales/").data[0]
+        self.assertEqual(row["section"], self.section.pk)
+        self.assertEqual([item["quantity"] for item in row["items"]], ["2.000"])
+
+
+# ----------------------------
+# Conditional GET
+# ----------------------------
+
+class SectionListTests(SaleTestCase):
+    def test_section_etag_follows_its_channel(self):
+        etag = self.client.get("/api/sales/sections/")["ETag"]
+        response = self.client.get("/api/sales/sections/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.channel.name = "Walk-in"
+        self.channel.save()
+        response = self.client.get("/api/sales/sections/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["channel"]["name"], "Walk-in")
+
+
+# ----------------------------
+# Section prices
+# ----------------------------
+
+class BulkSetPriceTests(SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kiosk = SalesSection.objects.create(channel=self.channel, name="Kiosk", location=self.shop)
+        SectionProductPrice.objects.create(section=self.section, product=self.pen, price="5.00")
+
+    def bulk_set(self, sections, items):
+        return self.client.post("/api/sales/prices/bulk-set/", {"sections": sections, "items": items}, format="json")
+
+    def prices(self):
+        return sorted(SectionProductPrice.objects.values_list("section_id", "product_id", "price"))
+
+    def test_valid_rows_are_upserted_and_the_rest_reported(self):
+        response = self.bulk_set([self.section.pk, self.kiosk.pk], [
+            {"product": self.pen.pk, "price": "5"},
+            {"product": self.ink.pk, "price": "7.5"},
+            {"product": self.pad.pk, "price": "-1"},
+            {"product": 999999, "price": "1"},
+            {"product": self.pen.pk, "price": "6"},
+            {"product": "abc", "price": "1"},
+            "not a row",
+        ])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            {key: response.data[key] for key in ("created", "updated", "unchanged")},
+            {"created": 3, "updated": 0, "unchanged": 1},
+        )
+        self.assertEqual([error["row"] for error in response.data["rejected"]], [2, 3, 4, 5, 6])
+        self.assertIn("price", response.data["rejected"][0]["errors"])
+        self.assertIn("does not exist", response.data["rejected"][1]["errors"]["product"])
+        self.assertIn("Duplicate", response.data["rejected"][2]["errors"]["product"])
+        self.assertEqual(self.prices(), sorted([
+            (self.section.pk, self.pen.pk, Decimal("5.00")),
+            (self.section.pk, self.ink.pk, Decimal("7.50")),
+            (self.kiosk.pk, self.pen.pk, Decimal("5.00")),
+            (self.kiosk.pk, self.ink.pk, Decimal("7.50")),
+        ]))
+
+    def test_changed_prices_are_updated_and_journaled(self):
+        self.bulk_set([self.section.pk, self.kiosk.pk], [{"product": self.pen.pk, "price": "5"}])
+        journaled = CatalogChange.objects.count()
+
+        response = self.bulk_set([self.section.pk, self.kiosk.pk], [
+            {"product": self.pen.pk, "price": "6"}, {"product": self.ink.pk, "price": "2"},
+        ])
+
+        self.assertEqual((response.data["created"], response.data["updated"]), (2, 2))
+        self.assertEqual(SectionProductPrice.objects.get(section=self.kiosk, product=self.pen).price, Decimal("6.00"))
+        self.assertEqual(
+            sorted(CatalogChange.objects.order_by("id")[journaled:].values_list("product_id", flat=True)),
+            sorted([self.pen.pk, self.ink.pk]),
+        )
+
+    def test_unknown_sections_write_nothing(self):
+        response = self.bulk_set([self.section.pk, 999999], [{"product": self.ink.pk, "price": "2"}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999999", response.data["detail"])
+        self.assertEqual(self.prices(), [(self.section.pk, self.pen.pk, Decimal("5.00"))])
+
+
+# ----------------------------
+# Invoice numbers
+# ----------------------------
+
+class InvoiceNumberTests(SaleTestCase):
+    def test_counter_is_sequential_per_section_and_day(self):
+        other = SalesSection.objects.create(channel=self.channel, name="Kiosk", location=self.shop)
+        today = timezone.localdate()
+
+        numbers = [InvoiceCounter.next_number(self.section, today) for _ in range(3)]
+        self.assertEqual(numbers, [1, 2, 3])
+        self.assertEqual(InvoiceCounter.next_number(other, today), 1)
+        self.assertEqual(InvoiceCounter.next_number(self.section, today + timedelta(days=1)), 1)
+        self.assertEqual(InvoiceCounter.next_number(self.section, today), 4)
+
+    def test_sales_get_consecutive_invoice_numbers(self):
+        first = self.post_sale([self.line(self.ink, 1)])
+        failed = self.post_sale([self.line(self.pen, 10)])
+        second = self.post_sale([self.line(self.ink, 1)])
+
+        self.assertEqual(failed.status_code, 400)
+        prefix = f"COU{timezone.now():%y%m%d}"
+        self.assertEqual(Sale.objects.get(pk=first.data["id"]).invoice_number, f"{prefix}001")
+        # The rolled-back sale does not use up a number
+        self.assertEqual(Sale.objects.get(pk=second.data["id"]).invoice_number, f"{prefix}002")
+
+
+# ----------------------------
+# Sales list
+# ----------------------------
+
+class SaleListTests(SaleTestCase):
+    def setUp(self):
+        super().setUp()
+        ProductLocation.objects.filter(product=self.ink).update(quantity=100)
+        self.kiosk = SalesSection.objects.create(channel=self.channel, name="Kiosk", location=self.shop)
+        self.sales = []
+        for day, hour, section, mode, amount in [
+            (1, 9, self.section, "Cash", 10),
+            (1, 23, self.kiosk, "Card", 20),
+            (2, 0, self.section, "Card", 30),
+            (2, 12, self.section, "Cash", 40),
+            (3, 8, self.kiosk, "Cash", 50),
+        ]:
+            response = self.post_sale([self.line(self.ink, 1, price=amount)], section=section)
+            self.assertEqual(response.status_code, 201, response.data)
+            sale = Sale.objects.get(pk=response.data["id"])
+            Sale.objects.filter(pk=sale.pk).update(
+                payment_mode=mode, sale_datetime=timezone.make_aware(datetime(2026, 3, day, hour))
+            )
+            self.sales.append(sale.pk)
+
+    def ids(self, **params):
+        response = self.client.get("/api/sales/sales/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row["id"] for row in response.data]
+
+    def test_filters_combine(self):
+        first, second, third, fourth, fifth = self.sales
+
+        self.assertEqual(self.ids(), [fifth, fourth, third, second, first])
+        self.assertEqual(self.ids(payment_mode="Cash"), [fifth, fourth, first])
+        self.assertEqual(self.ids(section=self.kiosk.pk), [fifth, second])
+        # A plain date_to includes that whole day; a datetime is exact
+        self.assertEqual(self.ids(date_from="2026-03-01", date_to="2026-03-01"), [second, first])
+        self.assertEqual(self.ids(date_from="2026-03-01T12:00:00", date_to="2026-03-02T00:00:00"), [third, second])
+        self.assertEqual(self.ids(date_from="2026-03-02", payment_mode="Cash", section=self.section.pk), [fourth])
+
+        response = self.client.get("/api/sales/sales/", {"date_from": "March"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_totals_cover_the_filtered_list(self):
+        response = self.client.get("/api/sales/sales/totals/", {"date_from": "2026-03-02", "payment_mode": "Cash"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(response.data["total_amount"], Decimal("90"))
+        self.assertEqual(response.data["discount"], Decimal("0"))
+
+    def test_cursor_pages_walk_the_whole_list(self):
+        seen = []
+        response = self.client.get("/api/sales/sales/", {"page_size": 2, "payment_mode": "Cash"})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(seen, self.ids(payment_mode="Cash"))
+
+
+# ----------------------------
+# Report rollups
+# ----------------------------
+
+class SalesRollupTests(SaleTestCase):
+    def rollups(self):
+        return sorted(SalesRollup.objects.values_list(
+            "grain", "period", "section_id", "payment_mode", "sales", "items", "gross", "discount", "net"
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        reports.rebuild()
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollups_follow_sales_and_their_lines(self):
+        first = Sale.objects.get(pk=self.post_sale([self.line(self.ink, 1, price=4)]).data["id"])
+        second = Sale.objects.get(pk=self.post_sale([self.line(self.ink, 2, price=3)]).data["id"])
+        self.assertMatchesRebuild()
+
+        # Lines added, edited, moved and deleted on their own, as the admin does
+        line = SaleItem.objects.create(
+            sale=first, product=self.ink, product_name="Ink", price=5, quantity=1, total=5, location=self.shop
+        )
+        self.assertMatchesRebuild()
+        line.total = 7
+        line.save()
+        self.assertMatchesRebuild()
+        line.sale = second
+        line.save()
+        self.assertMatchesRebuild()
+        line.delete()
+        self.assertMatchesRebuild()
 
-# Create your tests here.
+        first.payment_mode = "Online"
+        first.save()
+        self.assertMatchesRebuild()
+        second.delete()
+        self.assertMatchesRebuild()
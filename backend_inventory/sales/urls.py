@@ -1,6 +1,7 @@
 # sales/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import SalesChannelViewSet, SalesSectionViewSet, SectionProductPriceViewSet, SaleViewSet
+from .views import SalesChannelViewSet, SalesSectionViewSet, SectionProductPriceViewSet, SaleViewSet, SalesReportView
 
 router = DefaultRouter()
 router.register(r"channels", SalesChannelViewSet, basename="sales-channels")
@@ -8,4 +9,6 @@ router.register(r"sections", SalesSectionViewSet, basename="sales-sections")
 router.register(r"prices", SectionProductPriceViewSet, basename="sales-prices")
 router.register(r"sales", SaleViewSet, basename="sales")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("reports/", SalesReportView.as_view(), name="sales-reports"),
+]
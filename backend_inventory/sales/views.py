@@ -2,6 +2,11 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import SalesChannel, SalesSection, SectionProductPrice, Sale
 from .serializers import (
@@ -11,6 +16,11 @@ from .serializers import (
     SaleSerializer,
 )
 from products.models import Product
+from products.fieldsets import SparseFieldsetViewMixin
+from products.versions import ConditionalListMixin
+from . import prices, reports
+from .filters import SaleFilter, _moment
+from .pagination import SaleCursorPagination
 
 
 class IsStaffOrReadOnly(permissions.BasePermission):
@@ -20,16 +30,19 @@ class IsStaffOrReadOnly(permissions.BasePermission):
         return bool(request.user and request.user.is_staff)
 
 
-class SalesChannelViewSet(viewsets.ModelViewSet):
+class SalesChannelViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = SalesChannel.objects.all().order_by("name")
     serializer_class = SalesChannelSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    version_models = (SalesChannel,)
 
 
-class SalesSectionViewSet(viewsets.ModelViewSet):
+class SalesSectionViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = SalesSection.objects.select_related("channel", "location").all()
     serializer_class = SalesSectionSerializer
     permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
+    # Sections render their channel inline
+    version_models = (SalesSection, SalesChannel)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -68,20 +81,18 @@ class SectionProductPriceViewSet(viewsets.ModelViewSet):
         if not isinstance(items, list):
             return Response({"detail": "Invalid items"}, status=status.HTTP_400_BAD_REQUEST)
 
-        created, updated = 0, 0
-        for section_id in sections:
-            for row in items:
-                product = row.get("product")
-                price = row.get("price")
-                if not product or price is None:
-                    continue
-                obj, was_created = SectionProductPrice.objects.update_or_create(
-                    section_id=section_id, product_id=product, defaults={"price": price}
-                )
-                created += int(was_created)
-                updated += int(not was_created)
+        sections = list(dict.fromkeys(sections))
+        missing = set(sections) - set(SalesSection.objects.filter(pk__in=sections).values_list("pk", flat=True))
+        if missing:
+            return Response(
+                {"detail": f"Unknown sections: {', '.join(map(str, sorted(missing)))}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        return Response({"created": created, "updated": updated})
+        # The whole matrix is validated first, then upserted in chunks in one transaction
+        item_prices, rejected = prices.validate_items(items)
+        counts = prices.set_prices(sections, item_prices)
+        return Response({**counts, "rejected": rejected})
 
 
     @action(detail=False, methods=["get"], url_path="lookup")
@@ -109,12 +120,79 @@ class SectionProductPriceViewSet(viewsets.ModelViewSet):
         return Response({"product": int(product_id), "section": int(section_id), "price": str(spp.price)})
     
 
-class SaleViewSet(viewsets.ModelViewSet):
-    queryset = Sale.objects.select_related("channel", "section", "created_by").prefetch_related("items")
+class SaleViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = Sale.objects.order_by("-sale_datetime", "-id")
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SaleCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SaleFilter
+
+    def get_queryset(self):
+        # channel/section render as ids unless expanded, which needs no join
+        qs = super().get_queryset()
+        if self.expands("channel"):
+            qs = qs.select_related("channel")
+        if self.expands("section"):
+            qs = qs.select_related("section__channel")
+        if self.wants("created_by"):
+            qs = qs.select_related("created_by")
+        if self.wants("items"):
+            qs = qs.prefetch_related("items")
+        return qs
+
+    @action(detail=False, methods=["get"], url_path="totals")
+    def totals(self, request):
+        """Count and amount of every sale matching the list filters, for report headers."""
+        qs = self.filter_queryset(Sale.objects.all())
+        totals = qs.aggregate(
+            count=Count("id"),
+            total_amount=Coalesce(Sum("total_amount"), Decimal("0")),
+            discount=Coalesce(Sum("discount"), Decimal("0")),
+        )
+        return Response(totals)
 
     def perform_create(self, serializer):
         # created_by & sale_datetime handled in serializer.create (using request.user & default)
         serializer.context["request"] = self.request
         serializer.save()
+
+
+class SalesReportView(APIView):
+    """
+    GET /api/sales/reports/?date_from=&date_to=&group_by=day,section
+    Sales, line items, gross, discount and net over any range, answered from
+    the hourly/daily rollups. A plain date_to includes that whole day; a
+    datetime date_to is exclusive. Optional section, channel and
+    payment_mode filters.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    GROUP_BY = ("day", "hour", "section", "channel", "payment_mode")
+
+    def get(self, request):
+        params = request.query_params
+        if not params.get("date_from") or not params.get("date_to"):
+            return Response({"detail": "date_from and date_to are required"}, status=status.HTTP_400_BAD_REQUEST)
+        start = _moment("date_from", params["date_from"])
+        end = _moment("date_to", params["date_to"], next_day=True)
+        if start >= end:
+            return Response({"detail": "date_to must be after date_from"}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_by = [field for field in params.get("group_by", "day").split(",") if field]
+        unknown = [field for field in group_by if field not in self.GROUP_BY]
+        if unknown:
+            return Response(
+                {"detail": f"Unknown group_by: {', '.join(unknown)}. Use {', '.join(self.GROUP_BY)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        filters = {}
+        for name in ("section", "channel"):
+            if params.get(name):
+                if not params[name].isdigit():
+                    return Response({"detail": f"Invalid {name}"}, status=status.HTTP_400_BAD_REQUEST)
+                filters[name] = int(params[name])
+        if params.get("payment_mode"):
+            filters["payment_mode"] = params["payment_mode"]
+
+        return Response(reports.get_report(start, end, list(dict.fromkeys(group_by)), **filters))
@@ -39,6 +39,8 @@ export async function getProducts(): Promise<ProductProps[]> {
     total_quantity: item.total_quantity,
     active: item.active,
     image: item.image,
+    thumbnail: item.image_thumbnail,
+    mediumImage: item.image_medium,
     description: item.description,
     section_prices: item.section_prices?.map((sp: any) => ({
       section: sp.section,
@@ -72,6 +74,8 @@ export async function getProductByBarcode(barcode: string): Promise<ProductProps
     total_quantity: item.total_quantity,
     active: item.active,
     image: item.image,
+    thumbnail: item.image_thumbnail,
+    mediumImage: item.image_medium,
     description: item.description,
     section_prices: item.section_prices?.map((sp: any) => ({
       section: sp.section,
@@ -111,6 +115,14 @@ export async function getLocations() {
   return response.data;
 }
 
+// ---- INVENTORY SUMMARY ----
+export async function getInventorySummary() {
+  const response = await axios.get('https://razaworld.uk/api/products/summary/', {
+    headers: getAuthHeaders(),
+  });
+  return response.data;
+}
+
 // ---- UPDATE PRODUCT ----
 export async function updateProduct(id: string, data: any, isFormData = false) {
   const response = await axios.put(`${BASE_URL}${id}/`, data, {
@@ -47,6 +47,27 @@ export interface Sale {
   items?: SaleItem[];
 }
 
+export interface SaleFilters {
+  section?: number;
+  channel?: number;
+  payment_mode?: string;
+  created_by?: number;
+  date_from?: string;
+  date_to?: string;
+}
+
+export interface SalePage {
+  next: string | null;
+  previous: string | null;
+  results: Sale[];
+}
+
+export interface SaleTotals {
+  count: number;
+  total_amount: string;
+  discount: string;
+}
+
 // --- Axios instance ---
 const api = axios.create({
   baseURL: "https://razaworld.uk/api/sales/",
@@ -97,7 +118,14 @@ export const bulkSetSectionPrices = (
   api.post("prices/bulk-set/", { sections, items });
 
 // --- Sales ---
-export const getSales = () => api.get<Sale[]>("sales/");
+// One cursor page of sales matching `filters`; pass the previous page's `next` URL to continue
+export const getSalesPage = (filters: SaleFilters, cursorUrl?: string | null, pageSize = 50) =>
+  cursorUrl
+    ? api.get<SalePage>(cursorUrl)
+    : api.get<SalePage>("sales/", { params: { ...filters, page_size: pageSize } });
+
+export const getSalesTotals = (filters: SaleFilters) =>
+  api.get<SaleTotals>("sales/totals/", { params: filters });
 export const createSale = (sale: Partial<Sale>) => api.post("sales/", sale);
 export const updateSale = (id: number, sale: Partial<Sale>) => api.put(`sales/${id}/`, sale);
 export const deleteSale = (id: number) => api.delete(`sales/${id}/`);
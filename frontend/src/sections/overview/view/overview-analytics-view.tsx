@@ -3,7 +3,7 @@ import { useEffect, useState } from 'react';
 import Grid from '@mui/material/Grid';
 import Typography from '@mui/material/Typography';
 
-import { getProducts } from 'src/api/products';
+import { getInventorySummary } from 'src/api/products';
 import { DashboardContent } from 'src/layouts/dashboard';
 import { _posts, _tasks, _traffic, _timeline } from 'src/_mock';
 
@@ -27,25 +27,11 @@ export function OverviewAnalyticsView() {
 
   const fetchProductStats = async () => {
     try {
-      const products = await getProducts();
-
-      // Active products
-      const activeCount = products.filter((p) => p.active).length;
-      setActiveProductCount(activeCount);
-
-      // Total quantity across all locations
-      const quantitySum = products.reduce((acc, p) => {
-        const productTotalQty = p.locations.reduce((qAcc, loc) => qAcc + (loc.quantity || 0), 0);
-        return acc + productTotalQty;
-      }, 0);
-      setTotalQuantity(quantitySum);
-
-      // Total cost = sum of (rate * quantity at each location)
-      const costSum = products.reduce((acc, p) => {
-        const productCost = p.locations.reduce((cAcc, loc) => cAcc + (loc.quantity || 0) * (p.rate || 0), 0);
-        return acc + productCost;
-      }, 0);
-      setTotalCost(costSum);
+      const summary = await getInventorySummary();
+
+      setActiveProductCount(summary.active_products);
+      setTotalQuantity(summary.total_units);
+      setTotalCost(Number(summary.stock_value));
 
     } catch (error) {
       console.error("Failed to fetch product stats:", error);
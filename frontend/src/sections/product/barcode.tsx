@@ -16,7 +16,7 @@ const BarcodeDialog = ({ open, onClose, product }: Props) => {
   // Always call hooks, even if product is undefined
   const barcodeUrl = useMemo(() => {
     if (!product?.uniqueId) return null;
-    return `https://razaworld.uk/api/products/barcode/${product.uniqueId}/?t=${Date.now()}`;
+    return `https://razaworld.uk/api/products/barcode/${product.uniqueId}/`;
   }, [product?.uniqueId]);
 
   if (!product || !product.uniqueId) {
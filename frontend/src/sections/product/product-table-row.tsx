@@ -62,6 +62,8 @@ export type ProductProps = {
   rate: number;
   active: boolean;
   image?: string | File;
+  thumbnail?: string | null;
+  mediumImage?: string | null;
   locations: ProductLocationEntry[];
   total_quantity: number;
   description?: string;
@@ -234,7 +236,7 @@ export function ProductTableRow({
               src={
                 imageError
                   ? '/assets/images/fallback-image.png'
-                  : previewUrl ?? (typeof updatedProduct.image === 'string' ? updatedProduct.image : '')
+                  : previewUrl ?? (typeof updatedProduct.image === 'string' ? row.thumbnail || updatedProduct.image : '')
               }
               alt={row.itemName}
               variant="rounded"
@@ -400,7 +402,7 @@ export function ProductTableRow({
             src={
               imageError
                 ? '/assets/images/fallback-image.png'
-                : previewUrl ?? (typeof updatedProduct.image === 'string' ? updatedProduct.image : '')
+                : previewUrl ?? (typeof updatedProduct.image === 'string' ? row.mediumImage || updatedProduct.image : '')
             }
             alt={row.itemName}
             sx={{ width: '100%', height: 'auto', objectFit: 'contain' }}
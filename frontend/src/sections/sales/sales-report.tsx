@@ -22,7 +22,15 @@ import {
   MenuItem,
 } from "@mui/material";
 
-import { getSales, Sale, deleteSale, getSections, SalesSection } from "src/api/sales";
+import {
+  Sale,
+  SaleFilters,
+  deleteSale,
+  getSections,
+  getSalesPage,
+  SalesSection,
+  getSalesTotals,
+} from "src/api/sales";
 
 import SaleEditDialog from "src/sections/sales/sales-edit-dialog";
 
@@ -30,7 +38,9 @@ const paymentModes = ["Cash", "Credit", "Online"] as const;
 
 const SalesReportPage = () => {
   const [sales, setSales] = useState<Sale[]>([]);
-  const [filteredSales, setFilteredSales] = useState<Sale[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [totalSales, setTotalSales] = useState(0);
   const [sections, setSections] = useState<SalesSection[]>([]);
 
   const [selectedSale, setSelectedSale] = useState<Sale | null>(null);
@@ -46,40 +56,47 @@ const SalesReportPage = () => {
     [sections]
   );
 
+  // Filtering happens on the server; only the shown pages are downloaded
+  const filters = useMemo<SaleFilters>(() => {
+    const params: SaleFilters = {};
+    if (filterSection) params.section = filterSection;
+    if (filterPayment) params.payment_mode = filterPayment;
+    if (filterStartDate) params.date_from = filterStartDate;
+    if (filterEndDate) params.date_to = filterEndDate;
+    return params;
+  }, [filterSection, filterPayment, filterStartDate, filterEndDate]);
+
   useEffect(() => {
-    loadSales();
     loadSections();
   }, []);
 
+  useEffect(() => {
+    loadSales();
+  }, [filters]);
+
   const loadSales = () => {
-    getSales().then((res) => {
-      setSales(res.data);
-      setFilteredSales(res.data);
+    getSalesPage(filters).then((res) => {
+      setSales(res.data.results);
+      setNextPage(res.data.next);
     });
+    getSalesTotals(filters).then((res) => setTotalSales(Number(res.data.total_amount || 0)));
+  };
+
+  const loadMore = () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    getSalesPage(filters, nextPage)
+      .then((res) => {
+        setSales((prev) => [...prev, ...res.data.results]);
+        setNextPage(res.data.next);
+      })
+      .finally(() => setLoadingMore(false));
   };
 
   const loadSections = () => {
     getSections().then((res) => setSections(res.data));
   };
 
-  // --- Apply filters ---
-  useEffect(() => {
-    let filtered = [...sales];
-
-    if (filterSection) filtered = filtered.filter((s) => s.section === filterSection);
-    if (filterPayment) filtered = filtered.filter((s) => s.payment_mode === filterPayment);
-    if (filterStartDate)
-      filtered = filtered.filter(
-        (s) => s.sale_datetime && new Date(s.sale_datetime) >= new Date(filterStartDate)
-      );
-    if (filterEndDate)
-      filtered = filtered.filter(
-        (s) => s.sale_datetime && new Date(s.sale_datetime) <= new Date(filterEndDate)
-      );
-
-    setFilteredSales(filtered);
-  }, [sales, filterSection, filterPayment, filterStartDate, filterEndDate]);
-
   const handleDelete = async (id: number) => {
     if (!confirm("Are you sure you want to delete this sale?")) return;
     try {
@@ -91,11 +108,6 @@ const SalesReportPage = () => {
     }
   };
 
-  const totalSales = useMemo(
-    () => filteredSales.reduce((sum, s) => sum + Number(s.total_amount || 0), 0),
-    [filteredSales]
-  );
-
   return (
     <Box p={2}>
       <Typography variant="h5" mb={2}>
@@ -168,7 +180,7 @@ const SalesReportPage = () => {
             </TableRow>
           </TableHead>
           <TableBody>
-            {filteredSales.map((sale, index) => (
+            {sales.map((sale, index) => (
               <TableRow key={sale.id}>
                 <TableCell>{index + 1}</TableCell>
                 <TableCell>{sectionMap[sale.section] || "Unknown"}</TableCell>
@@ -207,6 +219,14 @@ const SalesReportPage = () => {
         </Table>
       </TableContainer>
 
+      {nextPage && (
+        <Box display="flex" justifyContent="center" mt={2}>
+          <Button variant="outlined" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load more"}
+          </Button>
+        </Box>
+      )}
+
       {/* --- Sale Details Dialog --- */}
       <Dialog
         open={!!selectedSale}